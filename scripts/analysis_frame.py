@@ -0,0 +1,32 @@
+# === Pre-joined Analysis Frame ===
+# Builds the annotated protein frame once. Sample intensities are not part of
+# it: they live in the partitioned sample store, and the sidebar selection
+# attaches only the selected columns as memory-mapped views.
+import pandas as pd
+from data_store import PROTEIN_ID
+
+SOURCE_TABLES = ["cleaned_data", "mapping_table", "uniprot_id_to_name_mapping", "protein_class_mapping"]
+ANNOTATION_SOURCE_COLUMNS = [PROTEIN_ID, "Protein names", "Gene names"]  # Read from cleaned_data
+
+
+# === BUILD ===
+# df holds ANNOTATION_SOURCE_COLUMNS in cleaned_data row order; the result keeps that order,
+# which is also the row order of the sample store
+def build_analysis_frame(df, uniprot_map, class_df):
+    master = df[ANNOTATION_SOURCE_COLUMNS]
+    uniprot_map = uniprot_map[["From", "Protein names"]].rename(
+        columns={"From": PROTEIN_ID, "Protein names": "UniProt Protein Name"}).drop_duplicates(PROTEIN_ID)
+    # Only the class: the class table's own Protein names would clash with cleaned_data's
+    class_df = class_df.rename(columns={"UniProt ID": PROTEIN_ID})[[PROTEIN_ID, "Protein Class"]].drop_duplicates(PROTEIN_ID)
+    master = master.merge(uniprot_map, on=PROTEIN_ID, how="left")
+    master = master.merge(class_df, on=PROTEIN_ID, how="left")
+    return master, master.columns.tolist()
+
+
+# === PROJECT ===
+# Frame for one sidebar selection: store columns are zero-copy views and annotation
+# columns are shared with the master frame, which is never modified
+def select_samples(master, annotation_cols, store, selected_labels):
+    columns = {label: store.column(label) for label in selected_labels}
+    columns.update({col: master[col] for col in annotation_cols})
+    return pd.DataFrame(columns, index=master.index, copy=False)
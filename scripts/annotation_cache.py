@@ -0,0 +1,139 @@
+# === Local UniProt Annotation Cache ===
+# SQLite key-value cache of UniProt entries keyed by accession. Resolving a
+# batch of IDs looks them up locally and only hands accessions that have
+# never been seen to a fetcher: the UniProt REST API, a flat-file dump, or
+# any callable returning rows in the same layout. Accessions another source
+# could not find are asked again, since a different source may know them.
+import io
+import os
+import sqlite3
+import time
+import urllib.parse
+import urllib.request
+import pandas as pd
+
+# Column layout of uniprot_id_to_name_mapping.tsv.gz (UniProt ID-mapping TSV export)
+ENTRY_COLUMNS = ["From", "Entry", "Reviewed", "Entry Name", "Protein names", "Gene Names", "Organism", "Length"]
+SQL_COLUMNS = ["accession", "entry", "reviewed", "entry_name", "protein_names", "gene_names", "organism", "length"]
+BATCH_SIZE = 500
+
+
+# === FETCHERS ===
+# A fetcher takes a list of accessions and returns a frame with ENTRY_COLUMNS;
+# accessions missing from the result are cached as not found by its source name.
+class UniProtRestFetcher:
+    source = "uniprot"
+    url = "https://rest.uniprot.org/uniprotkb/accessions"
+    fields = "accession,reviewed,id,protein_name,gene_names,organism_name,length,sec_acc"
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+
+    def __call__(self, accessions):
+        query = urllib.parse.urlencode({"accessions": ",".join(accessions), "fields": self.fields, "format": "tsv"})
+        with urllib.request.urlopen(f"{self.url}?{query}", timeout=self.timeout) as response:
+            entries = pd.read_csv(io.BytesIO(response.read()), sep="\t", dtype=str)
+        entries.columns = ENTRY_COLUMNS[1:] + ["Secondary"]  # Same order as fields
+        return requested_entries(entries, accessions)
+
+
+# Secondary and merged accessions come back under their primary Entry; each row is keyed by the
+# accession that was asked for, so the cache stores it under that ID
+def requested_entries(entries, accessions):
+    requested = set(accessions)
+    rows = []
+    for _, row in entries.iterrows():
+        secondary = row["Secondary"].split("; ") if isinstance(row["Secondary"], str) else []
+        for accession in [row["Entry"]] + secondary:
+            if accession in requested:
+                rows.append(row.copy())
+                rows[-1]["From"] = accession
+                requested.discard(accession)
+    return pd.DataFrame(rows, columns=ENTRY_COLUMNS).reset_index(drop=True)
+
+
+# Offline source: a local UniProt TSV dump in the ID-mapping layout (optionally gzipped)
+class FlatFileFetcher:
+    def __init__(self, path):
+        self.source = f"flatfile:{os.path.abspath(path)}"
+        entries = pd.read_csv(path, sep="\t", dtype=str)
+        if "From" not in entries.columns:
+            entries.insert(0, "From", entries["Entry"])
+        self.entries = entries[ENTRY_COLUMNS].drop_duplicates("From").set_index("From", drop=False)
+
+    def __call__(self, accessions):
+        return self.entries[self.entries.index.isin(accessions)]
+
+
+# Resolves nothing; used for cache-only runs and local testing
+class StubFetcher:
+    source = "stub"
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else pd.DataFrame(columns=ENTRY_COLUMNS)
+
+    def __call__(self, accessions):
+        return self.entries[self.entries["From"].isin(accessions)]
+
+
+# === CACHE ===
+class AnnotationCache:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS entries (
+                accession TEXT PRIMARY KEY, {", ".join(f"{col} TEXT" for col in SQL_COLUMNS[1:])},
+                found INTEGER NOT NULL, fetched_at REAL NOT NULL, source TEXT
+            )""")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if "source" not in columns:  # Caches written before sources were recorded
+            self.conn.execute("ALTER TABLE entries ADD COLUMN source TEXT")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # source: name of the fetcher the entries came from
+    def store(self, entries, requested=(), source=None):
+        now = time.time()
+        rows = [tuple(None if pd.isna(value) else str(value) for value in row) + (1, now, source)
+                for row in entries[ENTRY_COLUMNS].itertuples(index=False)]
+        found = set(entries["From"])
+        rows += [(acc,) + (None,) * (len(SQL_COLUMNS) - 1) + (0, now, source) for acc in requested if acc not in found]
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO entries VALUES ({', '.join('?' * (len(SQL_COLUMNS) + 3))})", rows)
+        self.conn.commit()
+
+    # Accessions from ids that have no cache row yet; with a source, also those only another source failed to find
+    def missing(self, accessions, source=None):
+        self._load_query(accessions)
+        rows = self.conn.execute(
+            "SELECT q.accession FROM query q LEFT JOIN entries e USING (accession) "
+            "WHERE e.accession IS NULL OR (? IS NOT NULL AND e.found = 0 AND e.source IS NOT ?)", (source, source))
+        return [row[0] for row in rows]
+
+    # Cached entries for accessions, in ENTRY_COLUMNS layout; not-found accessions are left out
+    def lookup(self, accessions):
+        self._load_query(accessions)
+        entries = pd.read_sql_query(
+            f"SELECT {', '.join(f'e.{col}' for col in SQL_COLUMNS)} FROM query q "
+            "JOIN entries e USING (accession) WHERE e.found = 1 ORDER BY q.rowid", self.conn)
+        entries.columns = ENTRY_COLUMNS
+        return entries
+
+    def _load_query(self, accessions):
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS query (accession TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM query")
+        self.conn.executemany("INSERT OR IGNORE INTO query VALUES (?)", ((acc,) for acc in accessions))
+
+    # === RESOLVE ===
+    # Fetch only accessions this fetcher has not looked up yet, in batches, then answer everything from the cache
+    def resolve(self, accessions, fetcher=None, batch_size=BATCH_SIZE):
+        accessions = list(dict.fromkeys(accessions))
+        if fetcher is not None:
+            source = getattr(fetcher, "source", type(fetcher).__name__)
+            todo = self.missing(accessions, source)
+            for start in range(0, len(todo), batch_size):
+                batch = todo[start:start + batch_size]
+                self.store(fetcher(batch), requested=batch, source=source)
+        return self.lookup(accessions)
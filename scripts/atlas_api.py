@@ -0,0 +1,266 @@
+# === Local HTTP/JSON Endpoint ===
+# Thin JSON layer over one warm AtlasEngine for pipelines that need bulk access
+# without a browser session. The engine is loaded once per server process and
+# reloaded when a new dataset snapshot is published (or the cleaned/ tables change).
+#
+#   GET  /health                      dataset version, proteins, samples and load time
+#   GET  /samples                     sample map (TMT_Label, Group, Cultivar_Treatment, ...)
+#   GET  /classes                     protein classes
+#   GET  /search?q=...&k=50           best matching protein labels
+#   GET  /neighbors?id=...&k=25       most correlated proteins (needs the neighbor index)
+#   POST /proteins                    {"proteins": [...], "groups": [...], "treatments": [...], "values": "groups" | "samples"}
+#   POST /heatmap                     {"class": ...} or {"proteins": [...]}, plus optional groups / treatments
+#   POST /contrast                    {"groups_a": [...], "groups_b": [...], "treatments": [...]}
+#   POST /export                      {"groups": [...], "treatments": [...], "format": "CSV"}  -> file body
+#
+# Run: python scripts/atlas_api.py --port 8765
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+from data_store import cleaned_dir, PROTEIN_ID
+from atlas_engine import ANNOTATION_FIELDS, AtlasEngine
+from export import EXPORT_FORMATS
+
+MAX_BATCH = 5000            # Protein IDs per request
+MAX_BODY_BYTES = 1 << 20
+
+
+class QueryError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# NaN -> null so the responses are strict JSON
+def json_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, values.round(6)).tolist()
+
+
+def records(frame):
+    return json.loads(frame.to_json(orient="records"))
+
+
+# === ENGINE HOLDER ===
+class AtlasService:
+    def __init__(self, directory=cleaned_dir):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.engine = None
+
+    # The warm engine, reloaded once if the source tables changed
+    def current(self):
+        with self.lock:
+            if self.engine is None or self.engine.is_stale():
+                self.engine = AtlasEngine(self.directory)
+                self.loaded_at = time.time()
+            return self.engine
+
+
+# === QUERIES ===
+# Optional list of strings from the request body
+def list_field(body, key):
+    values = body.get(key)
+    if values is not None and (not isinstance(values, list) or not all(isinstance(value, str) for value in values)):
+        raise QueryError(f"'{key}' must be a list of strings")
+    return values
+
+
+def labels_for(engine, body, groups_key="groups"):
+    labels = engine.sample_labels(list_field(body, groups_key), list_field(body, "treatments"))
+    if not labels:
+        raise QueryError("No samples match the requested groups and treatments")
+    return labels
+
+
+def protein_ids_for(engine, body):
+    protein_ids = body.get("proteins")
+    if not isinstance(protein_ids, list) or not protein_ids or not all(isinstance(protein_id, (str, int)) for protein_id in protein_ids):
+        raise QueryError("'proteins' must be a non-empty list of protein IDs")
+    if len(protein_ids) > MAX_BATCH:
+        raise QueryError(f"At most {MAX_BATCH} proteins per request")
+    return engine.resolve([str(protein_id) for protein_id in protein_ids])
+
+
+def query_proteins(engine, body):
+    mode = body.get("values", "groups")
+    if mode not in ("groups", "samples"):
+        raise QueryError("'values' must be \"groups\" or \"samples\"")
+    known, unknown = protein_ids_for(engine, body)
+    labels = labels_for(engine, body)
+    annotations = engine.annotations(known)
+    result = {"unknown": unknown, "proteins": []}
+    if mode == "samples":
+        values = engine.intensities(known, labels).to_numpy()
+        result["samples"] = labels
+        for i, row in annotations.iterrows():
+            result["proteins"].append({
+                "id": row[PROTEIN_ID], **{key: row[col] for col, key in ANNOTATION_FIELDS.items()},
+                "intensities": json_values(values[i]),
+            })
+    else:
+        means, counts = engine.group_means(known, labels)
+        result["groups"] = means.columns.tolist()
+        for i, row in annotations.iterrows():
+            result["proteins"].append({
+                "id": row[PROTEIN_ID], **{key: row[col] for col, key in ANNOTATION_FIELDS.items()},
+                "means": json_values(means.iloc[i]), "counts": counts.iloc[i].astype(int).tolist(),
+            })
+    for protein in result["proteins"]:  # Missing annotations are NaN in the frame
+        for key in ANNOTATION_FIELDS.values():
+            if pd.isna(protein[key]):
+                protein[key] = None
+    return result
+
+
+def query_heatmap(engine, body):
+    labels = labels_for(engine, body)
+    if "class" in body:
+        if not isinstance(body["class"], str) or body["class"] not in engine.cube.class_rows:
+            raise QueryError(f"Unknown protein class: {body['class']}", 404)
+        heatmap, unknown = engine.class_heatmap(body["class"], labels), []
+    else:
+        known, unknown = protein_ids_for(engine, body)
+        heatmap = engine.protein_heatmap(known, labels)
+    return {"rows": heatmap.index.tolist(), "groups": heatmap.columns.tolist(),
+            "values": [json_values(row) for row in heatmap.to_numpy()], "unknown": unknown}
+
+
+def query_contrast(engine, body):
+    labels_a, labels_b = labels_for(engine, body, "groups_a"), labels_for(engine, body, "groups_b")
+    if set(labels_a) & set(labels_b):
+        raise QueryError("A sample can only be on one side of the comparison")
+    return {"proteins": records(engine.contrast(labels_a, labels_b))}
+
+
+# === HTTP ===
+class AtlasHandler(BaseHTTPRequestHandler):
+    service = None  # AtlasService, set by serve()
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise QueryError("Request body too large", 413)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as exc:
+            raise QueryError(f"Invalid JSON: {exc}")
+        if not isinstance(body, dict):
+            raise QueryError("The request body must be a JSON object")
+        return body
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        self.respond(lambda engine: self.get_routes(engine, url.path, params))
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path == "/export":
+            return self.respond_export()
+        routes = {"/proteins": query_proteins, "/heatmap": query_heatmap, "/contrast": query_contrast}
+        if path not in routes:
+            return self.send_json({"error": f"Unknown endpoint: {path}"}, 404)
+        self.respond(lambda engine: routes[path](engine, self.read_body()))
+
+    def get_routes(self, engine, path, params):
+        if path == "/health":
+            return {"version": engine.version, "proteins": len(engine.matrix.row_offsets),
+                    "samples": len(engine.store.labels), "loaded_at": self.service.loaded_at}
+        if path == "/samples":
+            return {"samples": records(engine.sample_map())}
+        if path == "/classes":
+            return {"classes": engine.cube.classes}
+        if path == "/search":
+            query = params.get("q", [""])[0]
+            return {"results": [{"id": engine.matrix.label_to_id[label], "label": label}
+                                for label in engine.search(query, int(params.get("k", [50])[0]))]}
+        if path == "/neighbors":
+            known, _ = engine.resolve(params.get("id", [])[:1])
+            if not known:
+                raise QueryError("Unknown or missing protein 'id'", 404)
+            similar = engine.similar_proteins(known[0], int(params.get("k", [25])[0]))
+            if similar is None:
+                raise QueryError("No neighbor index; run scripts/pipeline.py or scripts/neighbors.py", 404)
+            return {"id": known[0], "neighbors": records(similar)}
+        raise QueryError(f"Unknown endpoint: {path}", 404)
+
+    # Every failure is answered as a JSON error, never a dropped connection
+    def send_error_json(self, exc):
+        if isinstance(exc, QueryError):
+            self.send_json({"error": str(exc)}, exc.status)
+        elif isinstance(exc, (KeyError, ValueError)):
+            self.send_json({"error": str(exc)}, 400)
+        else:
+            self.send_json({"error": f"Internal error: {type(exc).__name__}: {exc}"}, 500)
+
+    def respond(self, query):
+        try:
+            payload = query(self.service.current())
+        except Exception as exc:
+            return self.send_error_json(exc)
+        self.send_json(payload)
+
+    # Written to a temporary file and streamed back, so large exports are never a JSON string
+    def respond_export(self):
+        try:
+            body = self.read_body()
+            fmt = body.get("format", "CSV")
+            if not isinstance(fmt, str) or fmt not in EXPORT_FORMATS:
+                raise QueryError(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+            engine = self.service.current()
+            labels = labels_for(engine, body)
+        except Exception as exc:
+            return self.send_error_json(exc)
+
+        ext, mime = EXPORT_FORMATS[fmt]
+        handle, path = tempfile.mkstemp(suffix=ext, prefix="fusarium_atlas_api_")
+        os.close(handle)
+        try:
+            try:
+                engine.export(labels, fmt, path)
+            except Exception as exc:
+                return self.send_error_json(exc)
+            self.send_response(200)
+            self.send_header("Content-Type", mime)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.send_header("Content-Disposition", f'attachment; filename="atlas_export{ext}"')
+            self.end_headers()
+            with open(path, "rb") as source:
+                while chunk := source.read(1 << 20):
+                    self.wfile.write(chunk)
+        finally:
+            os.remove(path)
+
+
+def serve(host="127.0.0.1", port=8765, directory=cleaned_dir):
+    AtlasHandler.service = AtlasService(directory)
+    AtlasHandler.service.current()  # Load before accepting requests
+    server = ThreadingHTTPServer((host, port), AtlasHandler)
+    print(f"Serving the atlas on http://{host}:{port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve atlas queries as JSON over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data", default=cleaned_dir, help="Directory of the cleaned tables")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.data)
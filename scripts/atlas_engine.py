@@ -0,0 +1,165 @@
+# === Headless Query Engine ===
+# The data layer behind the dashboard as one importable object: loads the
+# annotation frame, sample store, matrix, group-mean cube and search index
+# once, then answers sample selection, protein lookup (single or batch),
+# class heatmap, table, contrast and export queries without Streamlit.
+# An instance reads one dataset version (see snapshots.py) and never sees it change.
+# dashboard.py keeps one instance per process and version; atlas_api.py serves one over HTTP.
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data_store import cleaned_dir, find_protein_table, find_table, read_table, read_table_columns, PROTEIN_ID
+from analysis_frame import ANNOTATION_SOURCE_COLUMNS, build_analysis_frame, select_samples
+from sample_store import SampleStore, ensure_partitions
+from protein_matrix import ProteinMatrix
+from heatmap_cube import GroupMeanCube, group_totals
+from search_index import ProteinSearchIndex
+from table_api import filter_rows, sort_rows
+from export import write_export
+from neighbors import read_neighbors
+import shared_data
+from snapshots import current_version, snapshot_dir
+
+ANNOTATION_FIELDS = {"UniProt Protein Name": "name", "Gene names": "gene", "Protein Class": "class"}
+HEATMAP_STATES = 8  # Group-mean states kept per sample selection
+
+
+# Annotation frame joined from the cleaned tables
+def load_master(directory):
+    annotations = read_table_columns(find_protein_table(directory), ANNOTATION_SOURCE_COLUMNS)
+    master, _ = build_analysis_frame(
+        annotations,
+        read_table(find_table("uniprot_id_to_name_mapping", directory)),
+        read_table(find_table("protein_class_mapping", directory))
+    )
+    return master
+
+
+class AtlasEngine:
+    # version: dataset version to load (default: the current one);
+    # shared: attach the annotation frame published for this dataset version instead of a private copy
+    def __init__(self, directory=cleaned_dir, version=None, shared=shared_data.ENABLED):
+        self.directory = directory
+        self.version = version or current_version(directory)
+        data_dir = self.data_dir = snapshot_dir(directory, self.version)
+        if shared:
+            self.master = shared_data.shared_frame(directory, self.version, "annotations", lambda: load_master(data_dir))
+        else:
+            self.master = load_master(data_dir)
+        self.annotation_cols = self.master.columns.tolist()
+        self.mapping = read_table(find_table("mapping_table", data_dir))
+
+        ensure_partitions(data_dir)
+        self.store = SampleStore(data_dir)
+        self.matrix = ProteinMatrix(self.master, self.mapping, self.store)
+        self.cube = GroupMeanCube(self.matrix, self.master)
+        self.search_index = ProteinSearchIndex(self.master, self.matrix.id_to_label)
+        self.neighbors = read_neighbors(data_dir, self.matrix.protein_ids)  # None until the index is built
+
+        self.states = OrderedDict()  # Sample labels -> CubeState, least recently used first
+        self.lock = threading.Lock()
+
+    # True when another dataset version was published (or the tables changed) since this instance was loaded
+    def is_stale(self):
+        return current_version(self.directory) != self.version
+
+    # === SAMPLES ===
+    # Mapping rows for the valid samples of the chosen groups and treatments (None keeps all)
+    def sample_map(self, groups=None, treatments=None):
+        mask = self.mapping["Group"].notna() & self.mapping["Cultivar_Treatment"].notna()
+        mask &= self.mapping["TMT_Label"].isin([label for label, valid in self.store.valid.items() if valid])
+        if groups is not None:
+            mask &= self.mapping["Group"].isin(groups)
+        if treatments is not None:
+            mask &= self.mapping["Cultivar_Treatment"].isin(treatments)
+        return self.mapping[mask]
+
+    def sample_labels(self, groups=None, treatments=None):
+        return self.sample_map(groups, treatments)["TMT_Label"].tolist()
+
+    # Annotation frame with the given sample columns attached as store views
+    def frame(self, labels):
+        return select_samples(self.master, self.annotation_cols, self.store, labels)
+
+    # === PROTEINS ===
+    def search(self, query, k=50):
+        return self.search_index.search(query, k)
+
+    # Known IDs in request order (duplicates dropped) and the unknown ones
+    def resolve(self, protein_ids):
+        protein_ids = list(dict.fromkeys(protein_ids))
+        known = [protein_id for protein_id in protein_ids if protein_id in self.matrix.row_offsets]
+        unknown = [protein_id for protein_id in protein_ids if protein_id not in self.matrix.row_offsets]
+        return known, unknown
+
+    def annotations(self, protein_ids):
+        rows = [self.matrix.row_offsets[protein_id] for protein_id in protein_ids]
+        return self.master.iloc[rows][[PROTEIN_ID] + list(ANNOTATION_FIELDS)].reset_index(drop=True)
+
+    # proteins x samples intensities for known protein IDs, one gather per sample column
+    def intensities(self, protein_ids, labels):
+        rows = np.array([self.matrix.row_offsets[protein_id] for protein_id in protein_ids], dtype=np.intp)
+        values = np.empty((len(rows), len(labels)), dtype=np.float32)
+        for j, label in enumerate(labels):
+            values[:, j] = self.store.column(label)[rows]
+        return pd.DataFrame(values, index=pd.Index(protein_ids, name=PROTEIN_ID), columns=labels)
+
+    # Per-group means and value counts (proteins x groups) over the given samples
+    def group_means(self, protein_ids, labels):
+        columns = self.matrix.sample_columns(labels)
+        codes, groups = np.unique(self.matrix.group_codes[columns], return_inverse=True)
+        values = self.intensities(protein_ids, labels).to_numpy()
+        sums, counts = group_totals(values, groups, len(codes))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+        index = pd.Index(protein_ids, name=PROTEIN_ID)
+        names = self.matrix.group_names[codes]
+        return pd.DataFrame(means, index=index, columns=names), pd.DataFrame(counts, index=index, columns=names)
+
+    # Most correlated proteins over all samples, best first; None when there is no neighbor index
+    def similar_proteins(self, protein_id, k=None):
+        if self.neighbors is None:
+            return None
+        rows, corr = self.neighbors
+        offset = self.matrix.row_offsets[protein_id]
+        found = rows[offset] >= 0
+        neighbors = self.master.iloc[rows[offset][found][:k]][[PROTEIN_ID] + list(ANNOTATION_FIELDS)]
+        return neighbors.assign(Correlation=corr[offset][found][:k]).reset_index(drop=True)
+
+    # === HEATMAPS ===
+    # Cube state for a sample selection; built from the all-sample totals and then only read
+    def cube_state(self, labels):
+        key = tuple(labels)
+        with self.lock:
+            if key in self.states:
+                self.states.move_to_end(key)
+                return self.states[key]
+        state = self.cube.update(self.cube.full_state(), self.matrix.sample_columns(labels))
+        with self.lock:
+            self.states[key] = state
+            while len(self.states) > HEATMAP_STATES:
+                self.states.popitem(last=False)
+        return state
+
+    def class_heatmap(self, protein_class, labels):
+        return self.cube.heatmap_matrix(self.cube_state(labels), self.cube.class_rows[protein_class])
+
+    def protein_heatmap(self, protein_ids, labels):
+        rows = [self.matrix.row_offsets[protein_id] for protein_id in protein_ids]
+        return self.cube.heatmap_matrix(self.cube_state(labels), rows)
+
+    # === TABLE / EXPORT / CONTRAST ===
+    # Filtered + sorted row positions; only the sample columns the filters and sort key use are attached
+    def table_rows(self, text_filters=(), number_filters=(), sort_by=None, ascending=True):
+        labels = [col for col in dict.fromkeys([col for col, _, _ in number_filters] + [sort_by])
+                  if col in self.store.partition_of]
+        frame = self.frame(labels)
+        return sort_rows(frame, filter_rows(frame, text_filters, number_filters), sort_by, ascending)
+
+    def export(self, labels, fmt, path):
+        return write_export(self.frame(labels), list(labels) + self.annotation_cols, fmt, path)
+
+    def contrast(self, labels_a, labels_b):
+        from differential import contrast_table  # scipy.special, loaded on the first contrast
+        return contrast_table(self.matrix, self.master, labels_a, labels_b)
@@ -0,0 +1,306 @@
+# === Benchmarks for the Data Paths ===
+# Generates a synthetic export shaped like ours (Perseus header rows, TMT
+# reporter channels grouped like mapping_table.csv, the same annotation and
+# metadata columns) and times each stage of the pipeline and the dashboard's
+# data layer headlessly. Wall time is the best of --repeat untraced runs; peak
+# memory comes from one extra run under tracemalloc. The JSON report can be
+# compared against an earlier one to catch regressions.
+#
+#   python scripts/benchmark.py --proteins 20000 --channels 120 --out bench.json
+#   python scripts/benchmark.py --proteins 20000 --channels 120 --compare bench.json
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import cleaning
+from analysis_frame import ANNOTATION_SOURCE_COLUMNS, build_analysis_frame, select_samples
+from clustering import heatmap_order
+from data_store import find_table, read_table, read_table_columns, PROTEIN_ID
+from differential import contrast_table
+from export import write_export
+from heatmap_cube import GroupMeanCube
+from heatmap_render import heatmap_figure
+from neighbors import build_neighbors
+from protein_matrix import ProteinMatrix
+from sample_store import SampleStore, partition_cleaned
+from search_index import ProteinSearchIndex
+
+# Groups as in mapping_table.csv: cultivar (H/M/L) + treatment (N/S) + hours (24/120)
+GROUPS = [f"{cultivar}{treatment}{hours}" for hours in (24, 120) for cultivar in "MHL" for treatment in "NS"]
+CHANNELS_PER_PLEX = 16
+ANNOTATION_COLUMNS = [
+    ("C: Only identified by site", "C"), ("C: Reverse", "C"), ("C: Potential contaminant", "C"), ("Organism", "T"),
+    ("Gene ontology (biological process)", "T"), ("Gene ontology (cellular component)", "T"), ("Transmembrane", "T"),
+    ("Signal peptide", "T"), ("Transit peptide", "T"), ("Keywords", "T"), ("Length", "N"), ("N: Peptides", "N"),
+]
+METADATA_COLUMNS = [
+    (PROTEIN_ID, "T"), ("Protein names", "T"), ("Gene names", "T"), ("T: Protein IDs", "T"),
+    ("T: Majority protein IDs", "T"), ("N: Unique peptides", "N"), ("N: Score", "N"), ("N: Q-value", "N"),
+    ("T: Fasta headers", "T"), ("N: Sequence coverage [%]", "N"), ("N: Mol. weight [kDa]", "N"), ("T: id", "T"),
+    ("N: Intensity", "N"), ("T: Gene names (primary)", "T"), ("N: MS/MS count", "N"),
+]
+NAME_WORDS = ["kinase", "transporter", "heat shock protein", "ribosomal protein", "chitinase", "peroxidase",
+              "dehydrogenase", "synthase", "permease", "thaumatin-like protein", "glucanase", "hypothetical protein"]
+CLASSES = ["Housekeeping", "Kinase", "Other", "Stress-response", "Transporter", "Mycotoxin-related"]
+GENERATE_CHUNK_ROWS = 10_000
+MISSING_FRACTION = 0.05
+MIN_REGRESSION_SECONDS = 0.05  # Smaller slowdowns are timer noise, not regressions
+# What dashboard.py imports before its first paint; plotting, grid, clustering and scipy load later
+STARTUP_IMPORTS = "import streamlit, pandas, atlas_engine, table_api, export, upload, diagnostics"
+
+
+# === SYNTHETIC DATA ===
+# Writes raw/proteomics_data.txt plus the uniprot and class tables the dashboard joins in
+def generate_dataset(directory, n_proteins, n_channels, seed=0):
+    rng = np.random.default_rng(seed)
+    raw_path = os.path.join(directory, "proteomics_data.txt")
+    out_dir = os.path.join(directory, "cleaned")
+    os.makedirs(out_dir, exist_ok=True)
+
+    sample_cols = [f"Reporter intensity corrected {i % CHANNELS_PER_PLEX + 1} {i // CHANNELS_PER_PLEX + 1}"
+                   for i in range(n_channels)]
+    groups = [GROUPS[i * len(GROUPS) // n_channels] for i in range(n_channels)]  # Contiguous blocks per group
+    replicate = pd.Series(groups).groupby(groups).cumcount() + 1
+    columns = sample_cols + [name for name, _ in ANNOTATION_COLUMNS] + [name for name, _ in METADATA_COLUMNS]
+    types = ["E"] * n_channels + [code for _, code in ANNOTATION_COLUMNS] + [code for _, code in METADATA_COLUMNS]
+    n_extra = len(columns) - n_channels
+    header_rows = [
+        ["#!{Type}" + types[0]] + types[1:],
+        ["#!{C: Sample}" + f"{replicate[0]}{groups[0]}"] + [f"{r}{g}" for r, g in zip(replicate[1:], groups[1:])] + [""] * n_extra,
+        ["#!{C: Group}" + groups[0]] + groups[1:] + [""] * n_extra,
+        ["#!{C: Treat}" + groups[0][:2]] + [g[:2] for g in groups[1:]] + [""] * n_extra,
+    ]
+
+    ids = np.array([f"SYN{i:07d}" for i in range(n_proteins)], dtype=object)
+    names = np.array([f"{NAME_WORDS[i % len(NAME_WORDS)]} {i % max(1, n_proteins // 3)}" for i in range(n_proteins)],
+                     dtype=object)
+    group_shift = rng.normal(0, 0.2, (len(GROUPS), 1)).astype(np.float32)
+    group_codes = np.array([GROUPS.index(g) for g in groups])
+
+    with open(raw_path, "w", encoding="utf-8", newline="") as handle:
+        handle.write("\t".join(columns) + "\n")
+        for row in header_rows:
+            handle.write("\t".join(row) + "\n")
+        for start in range(0, n_proteins, GENERATE_CHUNK_ROWS):
+            stop = min(n_proteins, start + GENERATE_CHUNK_ROWS)
+            values = rng.normal(0, 0.3, (stop - start, n_channels)).astype(np.float32) + group_shift[group_codes].T
+            values[rng.random(values.shape) < MISSING_FRACTION] = np.nan
+            chunk = pd.DataFrame(values, columns=sample_cols)
+            for name, code in ANNOTATION_COLUMNS + METADATA_COLUMNS:
+                chunk[name] = rng.integers(1, 50, stop - start) if code == "N" else ""
+            chunk[PROTEIN_ID] = ids[start:stop]
+            chunk["T: Protein IDs"] = ids[start:stop]
+            chunk["Protein names"] = names[start:stop]
+            chunk["Gene names"] = [f"GENE{i}" for i in range(start, stop)]
+            chunk["Keywords"] = [NAME_WORDS[i % len(NAME_WORDS)] for i in range(start, stop)]
+            chunk.to_csv(handle, sep="\t", header=False, index=False, float_format="%.5f", na_rep="NaN")
+
+    pd.DataFrame({
+        "From": ids, "Entry": ids, "Reviewed": "unreviewed", "Entry Name": ids + "_WHEAT", "Protein names": names,
+        "Gene Names": "", "Organism": "Triticum aestivum (Wheat)", "Length": rng.integers(80, 1200, n_proteins),
+    }).to_csv(os.path.join(out_dir, "uniprot_id_to_name_mapping.tsv.gz"), sep="\t", index=False)
+    pd.DataFrame({"UniProt ID": ids, "Protein names": names,
+                  "Protein Class": rng.choice(CLASSES, n_proteins)}).to_csv(
+        os.path.join(out_dir, "protein_class_mapping.csv"), index=False)
+    return raw_path, out_dir
+
+
+# === STAGES ===
+# Each stage takes the shared context dict and may add to it for later stages
+# Cold imports in a fresh interpreter (peak memory is not traced across processes)
+def stage_startup(ctx):
+    subprocess.run([sys.executable, "-c", STARTUP_IMPORTS], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+
+def stage_clean(ctx):
+    cleaning.clean_file(ctx["raw_path"], ctx["out_dir"])
+
+
+def stage_partition(ctx):
+    partition_cleaned(ctx["out_dir"])
+
+
+def stage_load(ctx):
+    out_dir = ctx["out_dir"]
+    annotations = read_table_columns(find_table("cleaned_data", out_dir), ANNOTATION_SOURCE_COLUMNS)
+    master, annotation_cols = build_analysis_frame(
+        annotations, read_table(find_table("uniprot_id_to_name_mapping", out_dir)),
+        read_table(find_table("protein_class_mapping", out_dir)))
+    mapping = read_table(find_table("mapping_table", out_dir))
+    ctx.update(master=master, annotation_cols=annotation_cols, mapping=mapping,
+               matrix=ProteinMatrix(master, mapping, SampleStore(out_dir)))
+
+
+def stage_filter(ctx):
+    mapping, matrix = ctx["mapping"], ctx["matrix"]
+    selected = mapping[mapping["Group"].isin(GROUPS[::2])]  # Half of the groups, like a sidebar selection
+    labels = selected["TMT_Label"].tolist()
+    ctx.update(labels=labels, columns=matrix.sample_columns(labels),
+               selected=select_samples(ctx["master"], ctx["annotation_cols"], matrix.store, labels))
+
+
+def stage_protein_explorer(ctx):
+    matrix = ctx["matrix"]
+    for protein_id in matrix.protein_ids[::max(1, len(matrix.protein_ids) // 100)]:
+        matrix.protein_frame(protein_id, ctx["columns"])
+        matrix.describe_by_group(protein_id, ctx["columns"])
+
+
+def stage_heatmap(ctx):
+    cube = GroupMeanCube(ctx["matrix"], ctx["master"])
+    state = cube.update(cube.full_state(), ctx["columns"])
+    ctx["heatmaps"] = {cls: cube.heatmap_matrix(state, cube.class_rows[cls]) for cls in cube.classes}
+
+
+def stage_cluster(ctx):
+    largest = max(ctx["heatmaps"].values(), key=len)
+    ctx["order"] = heatmap_order(largest)
+
+
+def stage_render(ctx):
+    for cls, heatmap in ctx["heatmaps"].items():
+        heatmap_figure(heatmap, cls, (-0.2, 0.2)).to_dict()
+
+
+def stage_neighbors(ctx):
+    matrix = ctx["matrix"]
+    build_neighbors(matrix.store.block(matrix.store.labels))
+
+
+def stage_differential(ctx):
+    mapping = ctx["mapping"]
+    labels = [mapping.loc[mapping["Group"] == group, "TMT_Label"].tolist() for group in GROUPS[:2]]
+    contrast_table(ctx["matrix"], ctx["master"], *labels)
+
+
+def stage_search(ctx):
+    index = ProteinSearchIndex(ctx["master"], ctx["matrix"].id_to_label)
+    for query in NAME_WORDS * 8:
+        index.search(query[:-1])
+
+
+def stage_export(ctx):
+    write_export(ctx["selected"], ctx["labels"] + ctx["annotation_cols"], "CSV",
+                 os.path.join(ctx["directory"], "export.csv"))
+
+
+STAGES = [
+    ("startup", stage_startup), ("clean", stage_clean), ("partition", stage_partition), ("load", stage_load), ("filter", stage_filter),
+    ("protein_explorer", stage_protein_explorer), ("heatmap", stage_heatmap), ("cluster", stage_cluster),
+    ("render", stage_render), ("differential", stage_differential), ("neighbors", stage_neighbors),
+    ("search", stage_search), ("export", stage_export),
+]
+SETUP_STAGES = ["clean", "partition", "load", "filter"]  # Always run (and reported)
+# Earlier stages whose results a stage reads; run untimed when only the later one is selected
+STAGE_REQUIRES = {"cluster": ["heatmap"], "render": ["heatmap"]}
+
+
+# === RUN ===
+def measure(stage, ctx, repeat, trace_memory=True):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage(ctx)
+        seconds.append(time.perf_counter() - start)
+    if not trace_memory:
+        return {"seconds": round(min(seconds), 4), "peak_mb": None}
+
+    # Separate run, since tracing slows Python-heavy stages down considerably
+    tracemalloc.start()
+    stage(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(min(seconds), 4), "peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(n_proteins, n_channels, repeat=1, stages=None, workdir=None, seed=0, trace_memory=True):
+    directory = workdir or tempfile.mkdtemp(prefix="fusarium_bench_")
+    start = time.perf_counter()
+    raw_path, out_dir = generate_dataset(directory, n_proteins, n_channels, seed)
+    print(f"Generated {n_proteins} x {n_channels} in {time.perf_counter() - start:.1f}s: {raw_path}")
+
+    ctx = {"directory": directory, "raw_path": raw_path, "out_dir": out_dir}
+    results = {}
+    selected = set(stages or [name for name, _ in STAGES]) | set(SETUP_STAGES)
+    required = {dep for name in selected for dep in STAGE_REQUIRES.get(name, ())}
+    for name, stage in STAGES:
+        if name not in selected:
+            if name in required:
+                stage(ctx)
+            continue
+        results[name] = measure(stage, ctx, repeat, trace_memory)
+        peak = results[name]["peak_mb"]
+        print(f"{name:>18}: {results[name]['seconds']:8.3f}s" + (f"  peak {peak:8.1f} MB" if peak is not None else ""))
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "packages": {"numpy": np.__version__, "pandas": pd.__version__, "pyarrow": pa.__version__},
+        "params": {"proteins": n_proteins, "channels": n_channels, "repeat": repeat, "seed": seed},
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": results,
+    }
+
+
+# Stages slower than the baseline by more than tolerance (a fraction)
+def compare_reports(report, baseline, tolerance):
+    regressions = []
+    for name, result in report["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before:
+            continue
+        ratio = result["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        slower = ratio > 1 + tolerance and result["seconds"] - before["seconds"] > MIN_REGRESSION_SECONDS
+        flag = "  <-- slower" if slower else ""
+        print(f"{name:>18}: {before['seconds']:8.3f}s -> {result['seconds']:8.3f}s  x{ratio:5.2f}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the cleaning and dashboard data paths on synthetic data.")
+    parser.add_argument("--proteins", type=int, default=20_000, help="Synthetic proteins (rows)")
+    parser.add_argument("--channels", type=int, default=120, help="Synthetic TMT channels (sample columns)")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage; the fastest is reported")
+    parser.add_argument("--stages", nargs="+", choices=[name for name, _ in STAGES], help="Only these stages (plus setup)")
+    parser.add_argument("--workdir", help="Directory for the generated data (default: a new temp directory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of each stage")
+    parser.add_argument("--out", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.proteins, args.channels, args.repeat, args.stages, args.workdir, args.seed,
+                            trace_memory=not args.no_memory)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=1)
+        print("✅ Report saved to:", args.out)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline["params"] != report["params"]:
+            print("⚠️ Baseline was run with different parameters:", baseline["params"])
+        if compare_reports(report, baseline, args.tolerance):
+            sys.exit(1)
@@ -1,53 +1,206 @@
 # Inspecting & Cleaning Proteomics Data
+# Streams the MaxQuant/Perseus export in row chunks so peak memory stays at a
+# few chunks rather than a multiple of the file size.
+import hashlib
+import io
+import json
 import os
+import sys
+import zlib
 import pandas as pd
+from data_store import write_store, read_store, StoreWriter, PROTEIN_ID
+from sample_store import partition_cleaned
 
 # === SETUP ===
-base_dir = os.path.dirname(os.path.dirname(__file__))  # Gets project root
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Gets project root
 data_path = os.path.join(base_dir, "data", "proteomics_data.txt")
 cleaned_dir = os.path.join(base_dir, "cleaned")
-os.makedirs(cleaned_dir, exist_ok=True)
 
-# === LOAD DATA ===
-df = pd.read_csv(data_path, sep="\t", low_memory=False)
+N_METADATA_ROWS = 4     # Perseus annotation rows under the header (Type, Sample, Group, Treatment, then any extras)
+N_TRAILING_COLS = 15    # Protein-level metadata columns at the end, not samples
+CHUNK_ROWS = 50_000     # Target rows per partition; actual boundaries depend on content
+PERSEUS_TYPES = {"E", "N", "C", "T", "M"}
 
-# === SEPARATE METADATA + CLEAN DATA ===
-metadata_rows = df.iloc[0:4]                      # Store metadata rows separately
-df_clean = df.iloc[4:].reset_index(drop=True)     # Real data starts from row 5
-df_clean.columns = df_clean.columns.str.strip()   # Clean column names
 
-# Convert values to numeric where possible
-for col in df_clean.columns:
-    df_clean[col] = pd.to_numeric(df_clean[col], errors='ignore')
+# === METADATA ===
+# Header plus the four annotation rows, read once without touching the body
+def read_metadata(path, n_metadata_rows=N_METADATA_ROWS):
+    metadata_rows = pd.read_csv(path, sep="\t", nrows=n_metadata_rows, dtype=str)
+    metadata_rows.columns = metadata_rows.columns.str.strip()  # Clean column names
+    return metadata_rows
 
-# Drop rows with missing protein ID
-df_clean = df_clean[df_clean["T: Single Protein IDs"].notna()]
 
-# Drop any columns starting with '#'
-columns_to_drop = [col for col in df_clean.columns if str(col).startswith("#")]
-df_clean = df_clean.drop(columns=columns_to_drop)
+# === DTYPE PLAN ===
+# Column -> dtype from the Perseus Type row (E: float32 intensities, N: float64, others text).
+# Exports without a Type row fall back to checking which columns of the first chunk parse as numbers.
+def dtype_plan(metadata_rows, first_chunk):
+    codes = metadata_rows.iloc[0].fillna("").str.replace(r"^#!\{Type\}", "", regex=True)
+    if codes.isin(PERSEUS_TYPES).all():
+        return {col: "float32" if code == "E" else "float64" if code == "N" else "string"
+                for col, code in codes.items()}
+
+    plan = {}
+    for col in first_chunk.columns:
+        parsed = pd.to_numeric(first_chunk[col], errors="coerce")
+        plan[col] = "float64" if parsed.notna().sum() == first_chunk[col].notna().sum() else "string"
+    return plan
+
+
+# === CLEAN ONE CHUNK ===
+def clean_chunk(chunk, plan, keep_cols):
+    chunk = chunk[keep_cols]
+    chunk = chunk[chunk[PROTEIN_ID].notna()]  # Drop rows with missing protein ID
+    typed = {}
+    for col in keep_cols:
+        if plan[col] == "string":
+            typed[col] = chunk[col].astype("string")
+        else:
+            typed[col] = pd.to_numeric(chunk[col], errors="coerce").astype(plan[col])
+    return pd.DataFrame(typed, index=chunk.index)
 
-# === SAVE CLEANED DATA ===
-cleaned_data_path = os.path.join(cleaned_dir, "cleaned_data.csv")
-df_clean.to_csv(cleaned_data_path, index=False)
-print("✅ Cleaned data saved to:", cleaned_data_path)
 
 # === BUILD MAPPING TABLE ===
-intensity_cols = metadata_rows.columns[:df.shape[1] - 15]  # Exclude metadata columns at the end
-
-mapping_df = pd.DataFrame({
-    "Original_Column": intensity_cols,
-    "Sample_Code": metadata_rows.iloc[1][intensity_cols].values,
-    "Group": metadata_rows.iloc[2][intensity_cols].values,
-    "Cultivar_Treatment": metadata_rows.iloc[3][intensity_cols].values
-})
-mapping_df["TMT_Label"] = ["TMT_" + str(i + 1) for i in range(len(mapping_df))]
-
-# Remove any placeholder groups from mapping
-mapping_df = mapping_df[~mapping_df["Group"].str.startswith("#", na=False)]
-mapping_df = mapping_df[~mapping_df["Cultivar_Treatment"].str.startswith("#", na=False)]
-
-# === SAVE CLEANED MAPPING TABLE ===
-mapping_path = os.path.join(cleaned_dir, "mapping_table.csv")
-mapping_df.to_csv(mapping_path, index=False)
-print("✅ Mapping table saved to:", mapping_path)
+def build_mapping(metadata_rows, n_trailing_cols=N_TRAILING_COLS):
+    intensity_cols = metadata_rows.columns[:metadata_rows.shape[1] - n_trailing_cols]  # Exclude metadata columns at the end
+
+    mapping_df = pd.DataFrame({
+        "Original_Column": intensity_cols,
+        "Sample_Code": metadata_rows.iloc[1][intensity_cols].values,
+        "Group": metadata_rows.iloc[2][intensity_cols].values,
+        "Cultivar_Treatment": metadata_rows.iloc[3][intensity_cols].values
+    })
+    mapping_df["TMT_Label"] = ["TMT_" + str(i + 1) for i in range(len(mapping_df))]
+
+    # Remove any placeholder groups from mapping
+    mapping_df = mapping_df[~mapping_df["Group"].str.startswith("#", na=False)]
+    mapping_df = mapping_df[~mapping_df["Cultivar_Treatment"].str.startswith("#", na=False)]
+    return mapping_df
+
+
+# === PARTITION THE BODY ===
+# Content-defined row partitions: a partition ends after a line whose checksum hits the
+# boundary condition, so inserting or editing a few rows only changes the partitions around them
+def iter_partitions(path, chunk_rows=CHUNK_ROWS, n_metadata_rows=N_METADATA_ROWS):
+    min_rows, max_rows = chunk_rows // 4, chunk_rows * 4
+    with open(path, "rb") as handle:
+        header = handle.readline()
+        for _ in range(n_metadata_rows):
+            handle.readline()
+        lines = []
+        for line in handle:
+            lines.append(line)
+            if len(lines) >= max_rows or (len(lines) >= min_rows and zlib.crc32(line) % chunk_rows == 0):
+                yield header, b"".join(lines)
+                lines = []
+        if lines:
+            yield header, b"".join(lines)
+
+
+def parse_partition(header, body, columns):
+    chunk = pd.read_csv(io.BytesIO(header + body), sep="\t", dtype=str)
+    chunk.columns = columns
+    return chunk
+
+
+# === STREAM + SAVE CLEANED DATA ===
+# Partitions are cleaned and appended to the CSV and the Arrow store as they are read.
+# With a cache_dir, each cleaned partition is kept under a hash of its raw bytes and the
+# dtype plan, and unchanged partitions are reused instead of re-parsed.
+# write_csv=False skips cleaned_data.csv, e.g. for batch ingestion where only the store is used.
+def clean_file(path, out_dir, chunk_rows=CHUNK_ROWS, cache_dir=None,
+               n_metadata_rows=N_METADATA_ROWS, n_trailing_cols=N_TRAILING_COLS, write_csv=True):
+    os.makedirs(out_dir, exist_ok=True)
+    metadata_rows = read_metadata(path, n_metadata_rows)
+    mapping_df = build_mapping(metadata_rows, n_trailing_cols)
+    sample_cols = mapping_df.loc[mapping_df["Group"].notna(), "Original_Column"].tolist()
+    keep_cols = [col for col in metadata_rows.columns if not col.startswith("#")]  # Drop any columns starting with '#'
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    cleaned_data_path = os.path.join(out_dir, "cleaned_data.csv")
+    tmp_csv_path = cleaned_data_path + ".tmp"
+    store = StoreWriter("cleaned_data", index=PROTEIN_ID, directory=out_dir)
+    plan = plan_key = None
+    n_rows = n_reused = 0
+    used_parts = set()
+    with open(tmp_csv_path if write_csv else os.devnull, "w", encoding="utf-8", newline="") as handle:
+        for header, body in iter_partitions(path, chunk_rows, n_metadata_rows):
+            chunk = None
+            if plan is None:
+                chunk = parse_partition(header, body, metadata_rows.columns)
+                plan = dtype_plan(metadata_rows, chunk)
+                plan.update({col: "float32" for col in sample_cols})  # Sample intensities are always float32
+                plan_key = json.dumps([plan, keep_cols]).encode("utf-8")
+
+            part_path = None
+            if cache_dir:
+                digest = hashlib.sha256(plan_key + body).hexdigest()
+                part_path = os.path.join(cache_dir, f"{digest}.arrow")
+                used_parts.add(os.path.basename(part_path))
+            if part_path and os.path.exists(part_path):
+                df_clean = read_store(part_path)
+                n_reused += 1
+            else:
+                if chunk is None:
+                    chunk = parse_partition(header, body, metadata_rows.columns)
+                df_clean = clean_chunk(chunk, plan, keep_cols).reset_index(drop=True)
+                if part_path:
+                    df_clean.to_feather(part_path + ".tmp", compression="uncompressed")
+                    os.replace(part_path + ".tmp", part_path)
+
+            if write_csv:
+                df_clean.to_csv(handle, index=False, header=store.writer is None)
+            store.write(df_clean)
+            n_rows += len(df_clean)
+    store_path = store.close()
+    if write_csv:
+        os.replace(tmp_csv_path, cleaned_data_path)
+        print(f"✅ Cleaned data ({n_rows} proteins) saved to:", cleaned_data_path)
+    if store_path:
+        print("✅ Columnar store saved to:", store_path)
+    if cache_dir:
+        # Partitions that no longer occur in the input are dropped from the cache
+        for name in os.listdir(cache_dir):
+            if name.endswith(".arrow") and name not in used_parts:
+                os.remove(os.path.join(cache_dir, name))
+        print(f"♻️ Reused {n_reused} of {len(used_parts)} cleaned partitions")
+
+    # === SAVE CLEANED MAPPING TABLE ===
+    mapping_path = os.path.join(out_dir, "mapping_table.csv")
+    mapping_df.to_csv(mapping_path, index=False)
+    print("✅ Mapping table saved to:", mapping_path)
+    store_path = write_store(mapping_df, "mapping_table", categorical_columns=["Group", "Cultivar_Treatment"], directory=out_dir)
+    print("✅ Columnar store saved to:", store_path)
+    return mapping_df
+
+
+# === CONVERT ANNOTATION TABLES ===
+# Annotation tables are curated outside this script; convert them to the columnar store when present
+def convert_class_table(out_dir):
+    class_map_path = os.path.join(out_dir, "protein_class_mapping.csv")
+    if os.path.exists(class_map_path):
+        class_df = pd.read_csv(class_map_path)
+        store_path = write_store(class_df, "protein_class_mapping", categorical_columns=["Protein Class"],
+                                 index="UniProt ID", directory=out_dir)
+        print("✅ Columnar store saved to:", store_path)
+
+
+def convert_uniprot_table(out_dir):
+    uniprot_path = os.path.join(out_dir, "uniprot_id_to_name_mapping.tsv.gz")
+    if os.path.exists(uniprot_path):
+        uniprot_df = pd.read_csv(uniprot_path, sep="\t", compression="gzip")
+        store_path = write_store(uniprot_df, "uniprot_id_to_name_mapping", categorical_columns=["Reviewed", "Organism"],
+                                 index="From", directory=out_dir)
+        print("✅ Columnar store saved to:", store_path)
+
+
+def convert_annotation_tables(out_dir):
+    convert_class_table(out_dir)
+    convert_uniprot_table(out_dir)
+
+
+if __name__ == "__main__":
+    raw_path = sys.argv[1] if len(sys.argv) > 1 else data_path
+    clean_file(raw_path, cleaned_dir)
+    partition_cleaned(cleaned_dir)
+    convert_annotation_tables(cleaned_dir)
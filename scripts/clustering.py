@@ -0,0 +1,64 @@
+# === Hierarchical Clustering for Heatmaps ===
+# Row and column orders for a group-mean heatmap from Ward linkage on
+# z-scored profiles, so proteins (and groups) with similar patterns end up
+# next to each other. Uses fastcluster's vector algorithm (O(n) memory) when it
+# is installed; otherwise scipy on condensed float32 distances built in blocks.
+import warnings
+import numpy as np
+from scipy.cluster.hierarchy import leaves_list, linkage as scipy_linkage
+
+try:
+    import fastcluster
+except ImportError:  # Optional speed-up
+    fastcluster = None
+
+BLOCK_ROWS = 1024
+
+
+# Rows scaled to mean 0 / sd 1; missing cells take the row mean (0), flat rows stay all 0
+def zscore_rows(values):
+    values = np.asarray(values, dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN rows
+        mean = np.nanmean(values, axis=1, keepdims=True)
+        std = np.nanstd(values, axis=1, keepdims=True)
+        scaled = (values - mean) / np.where(std > 0, std, 1)
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+# Condensed Euclidean distances (scipy pdist layout) in float32, one block of rows at a time
+def condensed_distances(x, block_rows=BLOCK_ROWS):
+    n = len(x)
+    out = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    squared = (x * x).sum(axis=1)
+    pos = 0
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        d2 = squared[start:stop, None] + squared[None, :] - 2 * (x[start:stop] @ x.T)
+        np.maximum(d2, 0, out=d2)
+        np.sqrt(d2, out=d2)
+        for i in range(start, stop):
+            row = d2[i - start, i + 1:]
+            out[pos:pos + len(row)] = row
+            pos += len(row)
+    return out
+
+
+def ward_linkage(x):
+    if fastcluster is not None:
+        return fastcluster.linkage_vector(x, method="ward")
+    return scipy_linkage(condensed_distances(x), method="ward")
+
+
+# Leaf order of the rows of values; fewer than 3 rows keep their order
+def cluster_order(values):
+    n = len(values)
+    if n < 3:
+        return np.arange(n)
+    return leaves_list(ward_linkage(zscore_rows(values)))
+
+
+# Row and column orders for a heatmap frame
+def heatmap_order(heatmap):
+    values = heatmap.to_numpy(dtype=np.float32)
+    return cluster_order(values), cluster_order(values.T)
@@ -1,31 +1,84 @@
 # === Fusarium Proteomics Full Dashboard ===
+import time
+script_started = time.perf_counter()  # Start of the "startup" diagnostics stage
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from st_aggrid import AgGrid, GridOptionsBuilder
-import seaborn as sns
-import matplotlib.pyplot as plt
+import numpy as np
 from pathlib import Path
 import os
+import tempfile
+import uuid
+from data_store import PROTEIN_ID
+from atlas_engine import AtlasEngine
+from snapshots import current_version
+from table_api import TEXT_FILTER_COLUMNS, page_count, page_window
+from export import EXPORT_FORMATS, ExportCache
+from upload import REQUIRED_COLUMNS, UploadError, file_digest, load_upload
+from diagnostics import MODE as DIAGNOSTICS_MODE, RerunTimer, cache_stats, counted_cache
 
-# === LOADER FUNCTION ===
-@st.cache_data(show_spinner=False)
-def load_table(name):
-    DATA_DIR = Path(__file__).resolve().parent.parent / "cleaned"
-    p_csv = DATA_DIR / f"{name}.csv"
-    p_tsv_gz = DATA_DIR / f"{name}.tsv.gz"
-    p_tsv = DATA_DIR / f"{name}.tsv"
-    p_xlsx = DATA_DIR / f"{name}.xlsx"
+DATA_DIR = os.environ.get("FUSARIUM_DATA_DIR") or Path(__file__).resolve().parent.parent / "cleaned"  # e.g. cleaned/atlas
+SEARCH_RESULTS = 50  # Options sent to the protein pickers per query
+SIMILAR_PROTEINS = 10
 
-    if p_csv.exists():
-        return pd.read_csv(p_csv)
-    if p_tsv_gz.exists():
-        return pd.read_csv(p_tsv_gz, sep="\t", compression="gzip")
-    if p_tsv.exists():
-        return pd.read_csv(p_tsv, sep="\t")
-    if p_xlsx.exists():
-        return pd.read_excel(p_xlsx)
-    raise FileNotFoundError(f"Could not find {name} in {DATA_DIR}")
+# === ENGINE ===
+# Every cache below is keyed on the dataset version, so a newly published snapshot is picked up on
+# the next rerun while entries for the previous one simply age out.
+# Loaded data, matrix, cube and search index per version; the previous version's engine stays
+# cached for reruns still using it
+@counted_cache(st.cache_resource(show_spinner=False, max_entries=2))
+def get_atlas(version):
+    return AtlasEngine(DATA_DIR, version)
+
+
+# One result table per contrast (sample labels of each side), shared by every session without a
+# per-rerun copy; callers only derive new frames from it
+@counted_cache(st.cache_resource(show_spinner="Testing all proteins...", max_entries=32))
+def get_contrast(version, labels_a, labels_b):
+    return get_atlas(version).contrast(labels_a, labels_b)
+
+
+# Heatmap row/column leaf orders per protein set and sample selection; the matrix itself is not hashed
+@counted_cache(st.cache_data(show_spinner="Clustering...", max_entries=64))
+def get_heatmap_order(version, rows_key, selection_key, _heatmap):
+    from clustering import heatmap_order
+    return heatmap_order(_heatmap)
+
+
+# Rendered heatmaps per protein set, sample selection, clustering and color scale; st.plotly_chart
+# serializes a copy, so the cached figure is never modified
+@counted_cache(st.cache_resource(show_spinner=False, max_entries=32))
+def get_heatmap_figure(version, rows_key, selection_key, clustered, zrange, title, _heatmap):
+    from heatmap_render import heatmap_figure
+    return heatmap_figure(_heatmap, title, zrange)
+
+
+# Parsed uploads by content hash, so widget changes after an upload never re-parse it
+@counted_cache(st.cache_resource(show_spinner="Reading upload...", max_entries=4))
+def get_upload(digest, _uploaded_file):
+    return load_upload(_uploaded_file, _uploaded_file.size)
+
+
+# Content hash of an upload, computed once per uploaded file and session
+def upload_digest(uploaded_file):
+    file_id, digest = st.session_state.get("upload_digest", (None, None))
+    if file_id != uploaded_file.file_id:
+        digest = file_digest(uploaded_file)
+        st.session_state["upload_digest"] = (uploaded_file.file_id, digest)
+    return digest
+
+
+# Export files on disk, least recently used evicted; one directory per server process
+@counted_cache(st.cache_resource(show_spinner=False))
+def get_export_cache():
+    return ExportCache(tempfile.mkdtemp(prefix="fusarium_atlas_exports_"))
+
+
+# Filtered + sorted row positions for the Full Data Table; paging is a slice of this. Shared read-only
+@counted_cache(st.cache_resource(show_spinner=False, max_entries=64))
+def get_table_rows(version, text_filters, number_filters, sort_by, ascending):
+    rows = get_atlas(version).table_rows(text_filters, number_filters, sort_by, ascending)
+    rows.flags.writeable = False
+    return rows
 
 
 
@@ -35,27 +88,38 @@ st.set_page_config(page_title="Fusarium Proteomics Atlas", layout="wide")
 
 
 
+# === DIAGNOSTICS ===
+# Off by default; FUSARIUM_DIAGNOSTICS times every session, ?diagnostics=1 times this one and shows the panel
+show_diagnostics = st.query_params.get("diagnostics") == "1"
+if (DIAGNOSTICS_MODE or show_diagnostics) and "diagnostics_session" not in st.session_state:
+    st.session_state["diagnostics_session"] = uuid.uuid4().hex[:12]
+run_timer = RerunTimer(bool(DIAGNOSTICS_MODE) or show_diagnostics, st.session_state.get("diagnostics_session"),
+                       started=script_started)
+run_timer.mark("load data")
+
+
+
+
 # === PATH SETUP ===
 base_dir = os.path.dirname(os.path.dirname(__file__))
-data_path = os.path.join(base_dir, "cleaned", "cleaned_data.csv")
-mapping_path = os.path.join(base_dir, "cleaned", "mapping_table.csv")
-class_map_path = os.path.join(base_dir, "cleaned", "protein_class_mapping.csv")
-uniprot_file = "uniprot_id_to_name_mapping.tsv.gz"
-uniprot_path = os.path.join(base_dir, "cleaned", uniprot_file)
 image_path = os.path.join(base_dir, "images", "green.jpg")
-compression_type = 'gzip' if uniprot_file.endswith('.gz') else None
 
 
 
 
 # === LOAD DATA ===
-df = pd.read_csv(data_path)
-mapping_df = pd.read_csv(mapping_path)
-class_df = pd.read_csv(class_map_path)
-class_df.rename(columns={"UniProt ID": "T: Single Protein IDs"}, inplace=True)
-uniprot_map = pd.read_csv(uniprot_path, sep='\t', compression=compression_type)
-uniprot_map = uniprot_map[['From', 'Protein names']]
-uniprot_map.rename(columns={'From': 'T: Single Protein IDs', 'Protein names': 'UniProt Protein Name'}, inplace=True)
+# Built once per process and per dataset version, shared by every session
+data_version = current_version(DATA_DIR)
+atlas = get_atlas(data_version)
+annotation_cols, mapping_df = atlas.annotation_cols, atlas.mapping
+sample_store, protein_matrix, group_mean_cube = atlas.store, atlas.matrix, atlas.cube
+
+
+# Top matches for a search box; an empty query lists the first labels alphabetically
+def protein_options(query):
+    if query.strip():
+        return atlas.search(query, SEARCH_RESULTS)
+    return protein_matrix.sorted_labels[:SEARCH_RESULTS]
 
 
 
@@ -91,24 +155,10 @@ with st.sidebar:
 
 
 # === FILTERING ===
-filtered_map = mapping_df[
-  mapping_df["Group"].isin(selected_groups) &
-  mapping_df["Cultivar_Treatment"].isin(selected_treatments)
-]
-selected_columns = filtered_map["Original_Column"].tolist()
+run_timer.mark("filter samples")
+filtered_map = atlas.sample_map(selected_groups, selected_treatments)
 selected_labels = filtered_map["TMT_Label"].tolist()
-rename_dict = dict(zip(selected_columns, selected_labels))
-df_filtered = df.rename(columns=rename_dict)
-df_selected = df_filtered[selected_labels + ["T: Single Protein IDs", "Protein names", "Gene names"]]
-df_selected[selected_labels] = df_selected[selected_labels].apply(pd.to_numeric, errors='coerce')
-df_selected = df_selected.merge(uniprot_map, on='T: Single Protein IDs', how='left')
-df_selected = df_selected.merge(class_df, on='T: Single Protein IDs', how='left')
-
-
-
-
-sample_to_group = dict(zip(filtered_map["TMT_Label"], filtered_map["Group"]))
-sample_to_treatment = dict(zip(filtered_map["TMT_Label"], filtered_map["Cultivar_Treatment"]))
+sample_columns = protein_matrix.sample_columns(selected_labels)
 
 
 
@@ -124,15 +174,20 @@ st.markdown("""
 
 
 # === TABS ===
-tabs = st.tabs(["Home", "Protein Explorer", "Full Data Table", "Heatmap Explorer", "Help & Info", "Upload Your Own Data"])
+# The tabs track which one is open and rerun on a switch, so only the open tab's body runs;
+# plotting and grid libraries are imported by the tabs that use them
+tabs = st.tabs(["Home", "Protein Explorer", "Full Data Table", "Heatmap Explorer", "Differential Expression",
+               "Help & Info", "Upload Your Own Data"], key="active_tab", on_change="rerun")
 
 
 
 
 # === HOME TAB ===
-with tabs[0]:
-  st.subheader("Background")
-  st.markdown("""
+if tabs[0].open:
+  run_timer.mark("home")
+  with tabs[0]:
+    st.subheader("Background")
+    st.markdown("""
 **Fusarium Head Blight (FHB)** is a serious fungal disease affecting wheat crops globally, with direct impacts on food security and agricultural sustainability.
 This project, the **Fusarium Proteomics Atlas**, provides an interactive platform to explore proteomic trends across multiple wheat varieties, infection statuses, and timepoints.
 
@@ -177,6 +232,7 @@ This platform bridges that gap by enabling:
 ### How to Use This Database:
 - **Protein Explorer**: Search and visualize protein intensity across treatments and cultivars.
 - **Full Data Table**: Browse, search, and download datasets.
+- **Differential Expression**: Compare two sets of sample groups across all proteins in a volcano plot.
 - **Help & Info**: Learn more about datasets and project background.
 
 
@@ -189,180 +245,256 @@ This platform bridges that gap by enabling:
 
 **Project Lead**: Kunjal Akolkar
 **Advisors**: Dr. Jennifer Geddes-McAlister, Dr. Lewis Lukens
-**Built with**: Streamlit + Plotly + AgGrid + Seaborn
+**Built with**: Streamlit + Plotly + AgGrid
 """)
 
 
 
 
 # === PROTEIN EXPLORER ===
-with tabs[1]:
-  st.subheader("Protein Explorer")
-  df_selected['Dropdown Label'] = df_selected['UniProt Protein Name'].fillna('Unknown') + " (" + df_selected['T: Single Protein IDs'] + ")"
-  dropdown_options = df_selected[['T: Single Protein IDs', 'Dropdown Label']].drop_duplicates()
+if tabs[1].open:
+  run_timer.mark("protein explorer")
+  with tabs[1]:
+    import plotly.express as px
+    st.subheader("Protein Explorer")
+    protein_query = st.text_input("Search proteins (accession, name or gene):", key="protein_search", persist_state="session")
+    protein_matches = protein_options(protein_query)
+    if not protein_matches:
+      st.info("No proteins match this search.")
+    else:
+      selected_protein_label = st.selectbox(f"Select a protein ({len(protein_matches)} best matches):", protein_matches,
+                                            key="protein_pick", persist_state="session")
+      selected_protein = protein_matrix.label_to_id[selected_protein_label]
+
+      # Row slice of the prebuilt matrix, restricted to the sidebar's sample columns
+      protein_long = protein_matrix.protein_frame(selected_protein, sample_columns)
+
+      fig = px.box(protein_long, x="Group", y="Intensity", color="Treatment", points="all",
+                   title=f"Intensity for {selected_protein}", labels={"Intensity": "Log2 Intensity"})
+      st.plotly_chart(fig, use_container_width=True)
+
+      st.dataframe(protein_matrix.describe_by_group(selected_protein, sample_columns))
+
+      # Precomputed over all samples, so it does not follow the sidebar filters
+      st.markdown("#### Proteins with similar profiles")
+      similar = atlas.similar_proteins(selected_protein, SIMILAR_PROTEINS)
+      if similar is None:
+        st.info("No correlation index yet; run `python scripts/pipeline.py` to build it.")
+      elif similar.empty:
+        st.info("Too few measured values to correlate this protein.")
+      else:
+        st.dataframe(similar, hide_index=True, column_config={"Correlation": st.column_config.NumberColumn(format="%.3f")})
 
 
 
 
-  selected_protein_label = st.selectbox("Select a protein:", dropdown_options['Dropdown Label'].sort_values())
-  selected_protein = dropdown_options[dropdown_options['Dropdown Label'] == selected_protein_label]['T: Single Protein IDs'].values[0]
-
+# === FULL DATA TABLE ===
+if tabs[2].open:
+  run_timer.mark("full data table")
+  with tabs[2]:
+    from st_aggrid import AgGrid, GridOptionsBuilder
+    st.subheader("Full Data Table")
+
+    # Filters, sorting and paging run on the server; only the visible page goes to the grid
+    text_cols = st.columns(len(TEXT_FILTER_COLUMNS))
+    text_filters = tuple(
+        (col, text_cols[i].text_input(f"{name} contains:", key=f"table_text_{col}", persist_state="session").strip())
+        for i, (col, name) in enumerate(TEXT_FILTER_COLUMNS.items())
+    )
 
+    number_filters = ()
+    with st.expander("Filter by TMT intensity"):
+        filter_col = st.selectbox("TMT column:", ["(none)"] + selected_labels, key="table_number_col", persist_state="session")
+        low_col, high_col = st.columns(2)
+        low = low_col.number_input("Min:", value=None, format="%.2f", key="table_number_min", persist_state="session")
+        high = high_col.number_input("Max:", value=None, format="%.2f", key="table_number_max", persist_state="session")
+        if filter_col != "(none)" and (low is not None or high is not None):
+            number_filters = ((filter_col, low, high),)
 
+    sort_col, order_col, size_col = st.columns([3, 1, 1])
+    sort_by = sort_col.selectbox("Sort by:", ["(none)"] + selected_labels + annotation_cols, key="table_sort", persist_state="session")
+    ascending = order_col.radio("Order:", ["Ascending", "Descending"], key="table_order", persist_state="session") == "Ascending"
+    page_size = size_col.selectbox("Rows per page:", [25, 50, 100, 250], index=2, key="table_page_size", persist_state="session")
 
-  protein_data = df_selected[df_selected['T: Single Protein IDs'] == selected_protein]
-  melted = protein_data.melt(id_vars=["T: Single Protein IDs"], value_vars=selected_labels,
-                             var_name="Sample", value_name="Intensity")
-  melted["Group"] = melted["Sample"].map(sample_to_group)
-  melted["Treatment"] = melted["Sample"].map(sample_to_treatment)
+    table_rows = get_table_rows(data_version, text_filters, number_filters,
+                                None if sort_by == "(none)" else sort_by, ascending)
+    n_pages = page_count(len(table_rows), page_size)
+    st.session_state.setdefault("table_page", 1)  # Set through session state only, so the clamp below never conflicts with a default
+    if st.session_state["table_page"] > n_pages:  # Filters shrank the result under the current page
+        st.session_state["table_page"] = n_pages
+    page = st.number_input(f"Page (of {n_pages}):", min_value=1, max_value=n_pages, key="table_page", persist_state="session") - 1
+    df_selected = atlas.frame(selected_labels)
+    table_page = page_window(df_selected, table_rows, selected_labels + annotation_cols, page, page_size)
+    st.caption(f"{len(table_rows):,} matching proteins")
 
+    gb = GridOptionsBuilder.from_dataframe(table_page)
+    for col in selected_labels:  # Format numeric TMT intensity columns
+        gb.configure_column(col, type=["numericColumn", "customNumericFormat"], precision=2)
+    gb.configure_default_column(filter=False, sortable=False, resizable=True)
+    gb.configure_column("UniProt Protein Name", header_name="Protein Name")
+    gb.configure_column("Gene names", header_name="Gene Names")
+    gridOptions = gb.build()
+    AgGrid(table_page, gridOptions=gridOptions, height=500, fit_columns_on_grid_load=True)
 
 
 
-  fig = px.box(melted, x="Group", y="Intensity", color="Treatment", points="all",
-               title=f"Intensity for {selected_protein}", labels={"Intensity": "Log2 Intensity"})
-  st.plotly_chart(fig, use_container_width=True)
 
+    # The export is only built when the button is clicked, then reused for the same selection
+    export_format = st.selectbox("Download format:", list(EXPORT_FORMATS), key="export_format", persist_state="session")
+    export_ext, export_mime = EXPORT_FORMATS[export_format]
 
+    def build_export(fmt=export_format, labels=tuple(selected_labels),
+                     key=(data_version, tuple(selected_labels), export_format)):
+        # The open cache file itself, so the export is read once by Streamlit rather than copied here first
+        return get_export_cache().open(key, fmt, lambda p: atlas.export(labels, fmt, p))
 
+    st.download_button("Download Filtered Data", data=build_export, file_name=f"filtered_data{export_ext}",
+                       mime=export_mime, on_click="ignore")
 
-  st.dataframe(melted.groupby("Group")["Intensity"].describe())
 
 
 
+# === HEATMAP EXPLORER ===
+# === HEATMAP EXPLORER ===
+if tabs[3].open:
+    run_timer.mark("heatmap explorer")
+
+    # Per-session group sums/counts, patched with only the samples whose selection changed
+    cube_key, cube_state = st.session_state.get("group_mean_state", (None, None))
+    if cube_key != data_version:
+        cube_state = group_mean_cube.full_state()
+    cube_state = group_mean_cube.update(cube_state, sample_columns)
+    st.session_state["group_mean_state"] = (data_version, cube_state)
+
+    with tabs[3]:
+        st.subheader("Heatmap Explorer")
+
+        # Dictionary for all class definitions (edit to match your mapping file)
+        CLASS_DEFS = {
+            "Housekeeping": "Core maintenance proteins (e.g., ribosomal, basic metabolism) that tend to be relatively stable.",
+            "Kinase": "Signaling enzymes that phosphorylate targets; coordinate stress and defense pathways.",
+            "Mycotoxin-related": "Proteins implicated in mycotoxin (e.g., DON) detox/response or pathways affecting toxin handling.",
+            "Stress-response": "General stress/defense machinery (e.g., heat-shock proteins, PR proteins, chaperones).",
+            "Transporter": "Membrane transport proteins moving ions/metabolites/toxins; can modulate stress tolerance.",
+            "Other": "Proteins not confidently assigned based on current annotations."
+        }
+
+        heatmap_mode = st.selectbox("Select Heatmap Mode", ["Protein Class", "Custom Proteins"], key="heatmap_mode", persist_state="session")
+        cluster_heatmap = st.checkbox("Cluster proteins and groups by expression pattern", value=True, key="heatmap_cluster", persist_state="session")
+
+        def arrange(heatmap, rows_key):
+            if not cluster_heatmap or heatmap.empty:
+                return heatmap
+            row_order, col_order = get_heatmap_order(data_version, rows_key, tuple(selected_labels), heatmap)
+            return heatmap.iloc[row_order, col_order]
+
+        def show_heatmap(heatmap, rows_key, title, zrange=None):
+            if not selected_labels or heatmap.shape[1] == 0:
+                st.info("Select at least one group and treatment in the sidebar to show the heatmap.")
+                return
+            if heatmap.empty:
+                st.info("None of these proteins have a UniProt name to show in the heatmap.")
+                return
+            fig = get_heatmap_figure(data_version, rows_key, tuple(selected_labels), cluster_heatmap, zrange, title, heatmap)
+            st.plotly_chart(fig, use_container_width=True)
+
+        if heatmap_mode == "Protein Class":
+            selected_class = st.selectbox(
+                "Choose a Protein Class:",
+                group_mean_cube.classes,
+                key="heatmap_class", persist_state="session"
+            )
+            heatmap_matrix = group_mean_cube.heatmap_matrix(cube_state, group_mean_cube.class_rows[selected_class])
+            heatmap_matrix = arrange(heatmap_matrix, ("class", selected_class))
+
+            use_fixed_scale = st.checkbox("Use fixed scale (±0.2) for better contrast", value=True, key="heatmap_fixed_scale",
+                                          persist_state="session")
+            show_heatmap(heatmap_matrix, ("class", selected_class), f"Class Heatmap: {selected_class}",
+                         (-0.2, 0.2) if use_fixed_scale else None)
+
+        elif heatmap_mode == "Custom Proteins":
+            # Options are the current picks plus the matches for the search box, not every label
+            custom_query = st.text_input("Search proteins to add:", key="custom_protein_search", persist_state="session")
+            picked = st.session_state.get("custom_proteins", [])
+            selected_proteins = st.multiselect(
+                "Select proteins to compare:",
+                options=list(dict.fromkeys(picked + protein_options(custom_query))),
+                key="custom_proteins", persist_state="session"
+            )
+            if selected_proteins:
+                selected_rows = [protein_matrix.row_offsets[protein_matrix.label_to_id[label]] for label in selected_proteins]
+                heatmap_matrix = group_mean_cube.heatmap_matrix(cube_state, selected_rows)
+                heatmap_matrix = arrange(heatmap_matrix, ("custom", tuple(selected_proteins)))
+
+                show_heatmap(heatmap_matrix, ("custom", tuple(selected_proteins)), "Custom Protein Heatmap")
+
+        # --- Always show all class definitions below heatmap ---
+        st.markdown("### Protein classes in this dashboard")
+        for cls, desc in CLASS_DEFS.items():
+            st.markdown(f"- **{cls}** — {desc}")
+
+        st.caption(
+            "How class names were assigned: `T: Single Protein IDs` were mapped to UniProt names/keywords and GO terms, "
+            "reviewed against Fusarium/DON literature, and lightly curated for ambiguous cases. "
+            "The rules live in `scripts/protein_classifier.py` and curated exceptions in `protein_class_overrides.csv`; "
+            "the resulting labels are stored in `protein_class_mapping.csv` and surfaced as **Protein Class** in the app."
+        )
 
-# === FULL DATA TABLE ===
-with tabs[2]:
-  st.subheader("Full Data Table")
-  gb = GridOptionsBuilder.from_dataframe(df_selected)
-  for col in selected_labels:  # Format numeric TMT intensity columns
-      gb.configure_column(col, type=["numericColumn", "numberColumnFilter", "customNumericFormat"], precision=2)
-  gb.configure_default_column(filter=True, sortable=True, resizable=True)
-  gb.configure_column("UniProt Protein Name", header_name="Protein Name", filter='agTextColumnFilter')
-  gb.configure_column("Gene names", header_name="Gene Names", filter='agTextColumnFilter')
-  gb.configure_pagination(enabled=True)
-  gridOptions = gb.build()
-  AgGrid(df_selected, gridOptions=gridOptions, height=500, fit_columns_on_grid_load=True)
 
 
+# === DIFFERENTIAL EXPRESSION ===
+if tabs[4].open:
+  run_timer.mark("differential expression")
+  with tabs[4]:
+    import plotly.express as px
+    from differential import MIN_SAMPLES
+    st.subheader("Differential Expression")
+    st.markdown("Compare two sets of sample groups across all proteins (A vs B; positive log2FC = higher in A).")
 
+    group_options = sorted(filtered_map["Group"].dropna().unique())
+    col_a, col_b = st.columns(2)
+    groups_a = col_a.multiselect("Group A:", group_options, default=group_options[:1], key="de_groups_a", persist_state="session")
+    groups_b = col_b.multiselect("Group B:", group_options, default=group_options[1:2], key="de_groups_b", persist_state="session")
 
-  csv = df_selected.to_csv(index=False).encode('utf-8')
-  st.download_button("Download Filtered Data", data=csv, file_name='filtered_data.csv', mime='text/csv')
+    stat_col, q_col, fc_col = st.columns([2, 1, 1])
+    statistic = stat_col.radio("Test:", ["Moderated t", "Welch t"], horizontal=True, key="de_statistic", persist_state="session")
+    q_cutoff = q_col.number_input("q-value cutoff:", min_value=0.0, max_value=1.0, value=0.05, step=0.01, key="de_q", persist_state="session")
+    fc_cutoff = fc_col.number_input("|log2FC| cutoff:", min_value=0.0, value=0.0, step=0.1, key="de_fc", persist_state="session")
 
+    if not groups_a or not groups_b:
+      st.info("Select at least one group on each side.")
+    elif set(groups_a) & set(groups_b):
+      st.info("A group can only be on one side of the comparison.")
+    else:
+      labels_a = tuple(filtered_map.loc[filtered_map["Group"].isin(groups_a), "TMT_Label"])
+      labels_b = tuple(filtered_map.loc[filtered_map["Group"].isin(groups_b), "TMT_Label"])
+      contrast = get_contrast(data_version, labels_a, labels_b)
 
+      test = statistic.removesuffix(" t")  # Column prefix in the contrast table
+      t_col, p_col, q_name = f"{test} t", f"{test} p", f"{test} q"
+      volcano = contrast.dropna(subset=[p_col]).assign(**{"-log10 p": lambda d: -np.log10(d[p_col])})
+      volcano["Significant"] = (volcano[q_name] < q_cutoff) & (volcano["log2FC"].abs() >= fc_cutoff)
+      fig = px.scatter(volcano, x="log2FC", y="-log10 p", color="Significant", render_mode="webgl",
+                       color_discrete_map={True: "#c0392b", False: "#b5b5b5"},
+                       hover_name="UniProt Protein Name", hover_data={PROTEIN_ID: True, q_name: ":.3g"},
+                       title=f"{' + '.join(groups_a)} vs {' + '.join(groups_b)} ({statistic})")
+      st.plotly_chart(fig, use_container_width=True)
+      st.caption(f"{int(volcano['Significant'].sum()):,} of {len(volcano):,} tested proteins significant "
+                 f"({len(labels_a)} vs {len(labels_b)} samples; proteins need {MIN_SAMPLES}+ values per side)")
 
+      hits = volcano[volcano["Significant"]].sort_values(q_name)
+      st.dataframe(hits[[PROTEIN_ID, "UniProt Protein Name", "Gene names", "Protein Class", "log2FC",
+                         t_col, p_col, q_name, "n A", "n B"]].head(500), hide_index=True)
 
-# === HEATMAP EXPLORER ===
-# === HEATMAP EXPLORER ===
-with tabs[3]:
-    st.subheader("Heatmap Explorer")
-
-    # Dictionary for all class definitions (edit to match your mapping file)
-    CLASS_DEFS = {
-        "Housekeeping": "Core maintenance proteins (e.g., ribosomal, basic metabolism) that tend to be relatively stable.",
-        "Kinase": "Signaling enzymes that phosphorylate targets; coordinate stress and defense pathways.",
-        "Mycotoxin-related": "Proteins implicated in mycotoxin (e.g., DON) detox/response or pathways affecting toxin handling.",
-        "Stress-response": "General stress/defense machinery (e.g., heat-shock proteins, PR proteins, chaperones).",
-        "Transporter": "Membrane transport proteins moving ions/metabolites/toxins; can modulate stress tolerance.",
-        "Other": "Proteins not confidently assigned based on current annotations."
-    }
-
-    heatmap_mode = st.selectbox("Select Heatmap Mode", ["Protein Class", "Custom Proteins"])
-
-    if heatmap_mode == "Protein Class":
-        selected_class = st.selectbox(
-            "Choose a Protein Class:",
-            sorted(df_selected["Protein Class"].dropna().unique())
-        )
-        class_subset = df_selected[df_selected["Protein Class"] == selected_class]
-        melted_class = class_subset.melt(
-            id_vars=["UniProt Protein Name"],
-            value_vars=selected_labels,
-            var_name="Sample",
-            value_name="Intensity"
-        )
-        melted_class["Group"] = melted_class["Sample"].map(sample_to_group)
-        heatmap_df = melted_class.groupby(["UniProt Protein Name", "Group"])["Intensity"].mean().reset_index()
-        heatmap_matrix = heatmap_df.pivot(index="UniProt Protein Name", columns="Group", values="Intensity")
-
-        use_fixed_scale = st.checkbox("Use fixed scale (±0.2) for better contrast", value=True)
-
-        fig_class, ax = plt.subplots(figsize=(12, 10))
-        if use_fixed_scale:
-            sns.heatmap(
-                heatmap_matrix,
-                cmap="coolwarm",
-                center=0,
-                vmin=-0.2, vmax=0.2,
-                linewidths=0.5,
-                cbar_kws={'label': 'Log2 Intensity'}
-            )
-        else:
-            sns.heatmap(
-                heatmap_matrix,
-                cmap="coolwarm",
-                center=0,
-                linewidths=0.5,
-                cbar_kws={'label': 'Log2 Intensity'}
-            )
-        ax.set_title(f"Class Heatmap: {selected_class}")
-        ax.set_xlabel("Group")
-        ax.set_ylabel("Protein Name")
-        plt.xticks(rotation=45)
-        st.pyplot(fig_class)
-
-    elif heatmap_mode == "Custom Proteins":
-        all_proteins = df_selected[['T: Single Protein IDs', 'UniProt Protein Name']].drop_duplicates()
-        all_proteins['Label'] = all_proteins['UniProt Protein Name'].fillna('Unknown') + " (" + all_proteins['T: Single Protein IDs'] + ")"
-        selected_proteins = st.multiselect(
-            "Select proteins to compare:",
-            options=all_proteins['Label'].sort_values()
-        )
-        if selected_proteins:
-            selected_ids = all_proteins[all_proteins['Label'].isin(selected_proteins)]['T: Single Protein IDs'].tolist()
-            custom_subset = df_selected[df_selected['T: Single Protein IDs'].isin(selected_ids)]
-            melted_custom = custom_subset.melt(
-                id_vars=["UniProt Protein Name"],
-                value_vars=selected_labels,
-                var_name="Sample",
-                value_name="Intensity"
-            )
-            melted_custom["Group"] = melted_custom["Sample"].map(sample_to_group)
-            heatmap_df = melted_custom.groupby(["UniProt Protein Name", "Group"])["Intensity"].mean().reset_index()
-            heatmap_matrix = heatmap_df.pivot(index="UniProt Protein Name", columns="Group", values="Intensity")
-
-            fig_custom, ax = plt.subplots(figsize=(12, 8))
-            sns.heatmap(
-                heatmap_matrix,
-                cmap="coolwarm",
-                center=0,
-                linewidths=0.5,
-                cbar_kws={'label': 'Log2 Intensity'}
-            )
-            ax.set_title("Custom Protein Heatmap")
-            ax.set_xlabel("Group")
-            ax.set_ylabel("Protein Name")
-            plt.xticks(rotation=45)
-            st.pyplot(fig_custom)
-
-    # --- Always show all class definitions below heatmap ---
-    st.markdown("### Protein classes in this dashboard")
-    for cls, desc in CLASS_DEFS.items():
-        st.markdown(f"- **{cls}** — {desc}")
-
-    st.caption(
-        "How class names were assigned: `T: Single Protein IDs` were mapped to UniProt names/keywords and GO terms, "
-        "reviewed against Fusarium/DON literature, and lightly curated for ambiguous cases. "
-        "These labels are stored in `protein_class_mapping.csv` and surfaced as **Protein Class** in the app."
-    )
 
 
 
 # === HELP & INFO ===
-with tabs[4]:
- st.subheader("Help & Info")
- st.markdown("""
+if tabs[5].open:
+ run_timer.mark("help")
+ with tabs[5]:
+  st.subheader("Help & Info")
+  st.markdown("""
 ### About This Dashboard
 
 
@@ -393,6 +525,7 @@ Provides background on the project, its biological significance, and overall goa
 #### 🧫 Protein Explorer  
 Use the dropdown to select any **individual protein**. You’ll see:
 - A **boxplot** of log2-transformed intensity values across all sample groups
+- The **proteins with the most similar profiles** (Pearson correlation over all samples)
 - Visualization of trends across cultivars and timepoints
 - Useful for observing differential expression in response to Fusarium
 
@@ -406,10 +539,17 @@ Explore all protein-level intensity values in a searchable, sortable table:
 View intensity heatmaps across selected protein sets:
 - **Protein Class Mode**: Select a protein class (e.g., defense response), and view global expression trends
 - **Custom Protein Mode**: Manually select multiple proteins to compare
+- **Clustering** (on by default): Reorders proteins and groups so similar expression patterns sit together
 - **Single Protein Heatmap**: Highlight how one protein behaves across all sample groups
 
 Great for spotting clusters of higher/lower-abundant proteins.
 
+#### ⚖️ Differential Expression  
+Compare two sets of sample groups (e.g., HN24 vs MN24) across all proteins at once:
+- **Moderated t** (variance shrunk toward the dataset-wide trend, robust with few replicates) or **Welch t**
+- **log2 fold change** and **Benjamini-Hochberg q-values**
+- A **volcano plot** and a table of significant proteins; only samples kept by the sidebar filters are used
+
 
 
 
@@ -475,6 +615,9 @@ Great for spotting clusters of higher/lower-abundant proteins.
 
 **Q:** What is Log2 Intensity?
 **A:** Protein abundance values have been log2-transformed to reduce skew and enhance visualization.
+Channels are median-normalized within each TMT plex and plexes are aligned to each other. Missing values stay blank
+everywhere except the heatmap group means, which fill them with low imputed values (left-censored, as in Perseus).
+Channels with too few quantified proteins are left out.
 
 
 
@@ -514,7 +657,7 @@ Great for spotting clusters of higher/lower-abundant proteins.
 
 **Lead:** Kunjal Akolkar
 **Advisors:** Dr. Jennifer Geddes-McAlister & Dr. Lewis Lukens
-**Built with:** Streamlit + Plotly + Seaborn + AgGrid
+**Built with:** Streamlit + Plotly + AgGrid
 """)
 
 
@@ -524,52 +667,56 @@ Great for spotting clusters of higher/lower-abundant proteins.
 
 # === UPLOAD YOUR OWN DATA ===
 # === UPLOAD YOUR OWN DATA ===
-with tabs[5]:
-    st.subheader("Upload Your Own Data")
-    st.markdown("Upload a CSV file to explore your own proteomics data.")
-
-    # --- Downloadable sample template (so users see the required format) ---
-    st.markdown("#### Download a sample template")
-    sample_df = pd.DataFrame(
-        [
-            {
-                "T: Single Protein IDs": "Q9Z0V6",
-                "Gene names": "GST1",
-                "Protein names": "Glutathione S-transferase 1",
-                "Sample1": 12.34,
-                "Sample2": 12.10,
-                "Sample3": 11.95,
-            },
-            {
-                "T: Single Protein IDs": "P12345",
-                "Gene names": "PR1",
-                "Protein names": "Pathogenesis-related protein 1",
-                "Sample1": 10.85,
-                "Sample2": 11.20,
-                "Sample3": 10.60,
-            },
-            {
-                "T: Single Protein IDs": "A0A3B6B5K8",
-                "Gene names": "AOX1",
-                "Protein names": "Ubiquinol oxidase (alternative oxidase)",
-                "Sample1": 13.05,
-                "Sample2": 13.40,
-                "Sample3": 13.10,
-            },
-        ]
-    )
-    sample_csv = sample_df.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        label="📥 Download Sample Data Template (CSV)",
-        data=sample_csv,
-        file_name="sample_upload_template.csv",
-        mime="text/csv",
-        help="Use this as a guide for column names and log2 intensity values.",
-    )
-    with st.expander("Preview of the sample template"):
-        st.dataframe(sample_df, use_container_width=True)
+# The uploader is created on every run, so an uploaded file survives switching tabs
+with tabs[6]:
+    if tabs[6].open:
+        run_timer.mark("upload")
+        import plotly.express as px
+        st.subheader("Upload Your Own Data")
+        st.markdown("Upload a CSV file to explore your own proteomics data.")
+
+        # --- Downloadable sample template (so users see the required format) ---
+        st.markdown("#### Download a sample template")
+        sample_df = pd.DataFrame(
+            [
+                {
+                    "T: Single Protein IDs": "Q9Z0V6",
+                    "Gene names": "GST1",
+                    "Protein names": "Glutathione S-transferase 1",
+                    "Sample1": 12.34,
+                    "Sample2": 12.10,
+                    "Sample3": 11.95,
+                },
+                {
+                    "T: Single Protein IDs": "P12345",
+                    "Gene names": "PR1",
+                    "Protein names": "Pathogenesis-related protein 1",
+                    "Sample1": 10.85,
+                    "Sample2": 11.20,
+                    "Sample3": 10.60,
+                },
+                {
+                    "T: Single Protein IDs": "A0A3B6B5K8",
+                    "Gene names": "AOX1",
+                    "Protein names": "Ubiquinol oxidase (alternative oxidase)",
+                    "Sample1": 13.05,
+                    "Sample2": 13.40,
+                    "Sample3": 13.10,
+                },
+            ]
+        )
+        sample_csv = sample_df.to_csv(index=False).encode("utf-8")
+        st.download_button(
+            label="📥 Download Sample Data Template (CSV)",
+            data=sample_csv,
+            file_name="sample_upload_template.csv",
+            mime="text/csv",
+            help="Use this as a guide for column names and log2 intensity values.",
+        )
+        with st.expander("Preview of the sample template"):
+            st.dataframe(sample_df, use_container_width=True)
 
-    st.markdown("""
+        st.markdown("""
     ### Data Format Requirements (for Upload)
 
     Your `.csv` must include:
@@ -584,44 +731,50 @@ with tabs[5]:
     # --- Uploader ---
     uploaded_file = st.file_uploader("Upload CSV", type=["csv"])
 
-    if uploaded_file:
-        user_df = pd.read_csv(uploaded_file)
-        st.success("File uploaded successfully!")
-        st.dataframe(user_df.head(), use_container_width=True)
-
-        # Column validation
-        required_columns = ["T: Single Protein IDs", "Gene names", "Protein names"]
-        missing = [col for col in required_columns if col not in user_df.columns]
-        if missing:
-            st.error(f"Missing required columns: {', '.join(missing)}")
+    if uploaded_file and tabs[6].open:
+        try:
+            upload_master, upload_matrix, ignored_cols = get_upload(upload_digest(uploaded_file), uploaded_file)
+        except UploadError as exc:
+            st.error(str(exc))
         else:
-            st.success("File format looks good!")
+            upload_samples = list(upload_matrix.sample_labels)
+            st.success(f"File format looks good! {len(upload_master):,} proteins x {len(upload_samples):,} samples.")
+            if ignored_cols:
+                st.info(f"Ignored non-numeric columns: {', '.join(ignored_cols)}")
+            st.dataframe(upload_master[REQUIRED_COLUMNS].head().join(
+                pd.DataFrame(upload_matrix.store.values[:5], columns=upload_samples)), use_container_width=True)
 
             # Build dropdown for quick visualization
-            user_df["Dropdown Label"] = user_df["Protein names"].fillna('Unknown') + " (" + user_df["T: Single Protein IDs"] + ")"
-            dropdown_options = user_df[["T: Single Protein IDs", "Dropdown Label"]].drop_duplicates()
-
             selected_protein_label = st.selectbox(
                 "Select a protein to visualize:",
-                dropdown_options["Dropdown Label"].sort_values()
+                upload_matrix.sorted_labels,
+                key="upload_protein", persist_state="session"
+            )
+            selected_protein = upload_matrix.label_to_id[selected_protein_label]
+            melted_user = upload_matrix.protein_frame(selected_protein, np.arange(len(upload_samples)))
+
+            fig = px.box(
+                melted_user, x="Sample", y="Intensity", points="all",
+                title=f"Intensity Distribution for {selected_protein}",
+                labels={"Intensity": "Log2 Intensity"}
             )
-            selected_protein = dropdown_options[
-                dropdown_options["Dropdown Label"] == selected_protein_label
-            ]["T: Single Protein IDs"].values[0]
-
-            # Identify intensity columns as "everything else"
-            intensity_cols = [c for c in user_df.columns if c not in required_columns + ["Dropdown Label"]]
-            if not intensity_cols:
-                st.warning("No intensity columns detected. Make sure you included sample columns (e.g., Sample1, Sample2...).")
-            else:
-                melted_user = user_df[user_df["T: Single Protein IDs"] == selected_protein].melt(
-                    id_vars=["T: Single Protein IDs"], value_vars=intensity_cols,
-                    var_name="Sample", value_name="Intensity"
-                )
-
-                fig = px.box(
-                    melted_user, x="Sample", y="Intensity", points="all",
-                    title=f"Intensity Distribution for {selected_protein}",
-                    labels={"Intensity": "Log2 Intensity"}
-                )
-                st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(fig, use_container_width=True)
+
+
+
+
+# === DIAGNOSTICS PANEL ===
+# Cache counters are per server process; stage times and peaks are for this rerun only
+if run_timer.enabled:
+    export_cache = get_export_cache()
+    run_record = run_timer.finish(cache_stats({
+        "sample partitions": {"hits": sample_store.hits, "misses": sample_store.misses},
+        "export files": {"hits": export_cache.hits, "misses": export_cache.misses},
+    }))
+    if show_diagnostics:
+        with st.expander("Diagnostics", expanded=True):
+            st.caption(f"Session {run_record['session']} · rerun took {run_record['total_seconds']:.3f} s"
+                       + ("" if DIAGNOSTICS_MODE == "memory" else " · start with FUSARIUM_DIAGNOSTICS=memory for memory peaks"))
+            st.dataframe(pd.DataFrame.from_dict(run_record["stages"], orient="index").rename_axis("Stage"))
+            st.dataframe(pd.DataFrame.from_dict(run_record["caches"], orient="index",
+                                                columns=["calls", "hits", "misses"]).rename_axis("Cache"))
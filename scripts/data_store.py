@@ -0,0 +1,139 @@
+# === Columnar Store for the cleaned/ Artifacts ===
+# Typed Arrow IPC (Feather v2) copies of the text tables in cleaned/.
+# Files are written uncompressed so the dashboard can memory-map them
+# instead of re-parsing CSV and inflating gzip on every cold start.
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cleaned_dir = os.path.join(base_dir, "cleaned")
+
+PROTEIN_ID = "T: Single Protein IDs"
+PROTEIN_TABLES = ["cleaned_data", "proteins"]  # One cleaned dataset, or an atlas merged by ingest.py
+STORE_EXT = ".arrow"
+TABLE_EXTS = [STORE_EXT, ".csv", ".tsv.gz", ".tsv", ".xlsx"]  # Lookup order, store first
+
+
+def store_path(name, directory=None):
+    return os.path.join(directory or cleaned_dir, f"{name}{STORE_EXT}")
+
+
+# === WRITE ===
+def write_store(df, name, float_columns=(), categorical_columns=(), index=None, directory=None):
+    typed = df.copy()
+    for col in float_columns:
+        typed[col] = pd.to_numeric(typed[col], errors="coerce").astype("float32")
+    for col in categorical_columns:
+        typed[col] = typed[col].astype("category")
+    if index is not None:
+        typed = typed.set_index(index)
+
+    path = store_path(name, directory)
+    tmp_path = path + ".tmp"
+    table = pa.Table.from_pandas(typed, preserve_index=index is not None)
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)  # Readers never see a half-written file
+    return path
+
+
+# Appends frames with the same columns and dtypes as record batches, for chunked writers.
+# The file only replaces the previous store on close().
+class StoreWriter:
+    def __init__(self, name, index=None, directory=None):
+        self.path = store_path(name, directory)
+        self.tmp_path = self.path + ".tmp"
+        self.index = index
+        self.schema = None
+        self.writer = None
+
+    def write(self, df):
+        if self.index is not None:
+            df = df.set_index(self.index)
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=self.index is not None)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pa.ipc.new_file(self.tmp_path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            return None
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+
+# === READ ===
+def read_store(path):
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+# Only the requested columns; a stored index comes back as a plain column
+def read_store_columns(path, columns):
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(ignore_metadata=True)
+
+
+def store_column_names(path):
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+# === LOOKUP ===
+def find_table(name, directory=None):
+    directory = directory or cleaned_dir
+    for ext in TABLE_EXTS:
+        path = os.path.join(directory, f"{name}{ext}")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Could not find {name} in {directory}")
+
+
+# Per-protein table whose row order the sample partitions follow
+def find_protein_table(directory=None):
+    for name in PROTEIN_TABLES:
+        try:
+            return find_table(name, directory)
+        except FileNotFoundError:
+            pass
+    raise FileNotFoundError(f"Could not find {' or '.join(PROTEIN_TABLES)} in {directory or cleaned_dir}")
+
+
+def read_table(path):
+    if path.endswith(STORE_EXT):
+        table = read_store(path)
+        if table.index.name is None:
+            return table
+        # Index back to a leading column (concat, since insert on a split-block frame warns)
+        return pd.concat([table.index.to_frame(index=False), table.reset_index(drop=True)], axis=1)
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    if path.endswith(".tsv.gz"):
+        return pd.read_csv(path, sep="\t", compression="gzip")
+    if path.endswith(".tsv"):
+        return pd.read_csv(path, sep="\t")
+    return pd.read_excel(path)
+
+
+# Only the requested columns of any supported table
+def read_table_columns(path, columns):
+    if path.endswith(STORE_EXT):
+        return read_store_columns(path, columns)
+    if path.endswith(".csv"):
+        return pd.read_csv(path, usecols=columns)[columns]
+    if path.endswith((".tsv.gz", ".tsv")):
+        return pd.read_csv(path, sep="\t", usecols=columns)[columns]
+    return pd.read_excel(path, usecols=columns)[columns]
+
+
+# Cheap (path, mtime, size) stamp per table, used as a cache key for anything built from them
+def source_fingerprint(names, directory=None):
+    stamps = []
+    for name in names:
+        path = find_table(name, directory)
+        stat = os.stat(path)
+        stamps.append((name, path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
@@ -0,0 +1,105 @@
+# === Opt-in Diagnostics ===
+# Per-rerun stage timers, optional tracemalloc peaks and cache hit/miss
+# counters for the dashboard. Off unless FUSARIUM_DIAGNOSTICS is set
+# ("1" for timers, "memory" to also trace allocations) or a session opens
+# the app with ?diagnostics=1. Every instrumented rerun is appended as one
+# JSON line to FUSARIUM_DIAGNOSTICS_LOG (default: in the temp directory).
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+MODE = os.environ.get("FUSARIUM_DIAGNOSTICS", "").lower()
+LOG_PATH = os.environ.get("FUSARIUM_DIAGNOSTICS_LOG") or os.path.join(tempfile.gettempdir(), "fusarium_atlas_diagnostics.jsonl")
+TRACE_MEMORY = MODE == "memory"
+
+_lock = threading.Lock()
+cache_counts = Counter()    # (cache name, "calls" | "misses") -> count, per process
+
+
+# === CACHE COUNTERS ===
+# Wraps a Streamlit cache decorator: the body only runs on a miss, the wrapper on every call.
+# functools.wraps keeps the name, source and signature Streamlit keys the cache on.
+def counted_cache(cache_decorator, name=None):
+    def decorate(func):
+        key = name or func.__name__
+
+        @functools.wraps(func)
+        def on_miss(*args, **kwargs):
+            with _lock:
+                cache_counts[key, "misses"] += 1
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(on_miss)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            with _lock:
+                cache_counts[key, "calls"] += 1
+            return cached(*args, **kwargs)
+
+        call.clear = cached.clear
+        return call
+    return decorate
+
+
+# name -> {"calls", "hits", "misses"}; other caches can add their own counters through extra
+def cache_stats(extra=None):
+    with _lock:
+        names = sorted({name for name, _ in cache_counts})
+        stats = {name: {"calls": cache_counts[name, "calls"], "misses": cache_counts[name, "misses"]} for name in names}
+    for name, counts in (extra or {}).items():
+        stats[name] = {"calls": counts["hits"] + counts["misses"], "misses": counts["misses"]}
+    for counts in stats.values():
+        counts["hits"] = counts["calls"] - counts["misses"]
+    return stats
+
+
+# === RERUN TIMER ===
+# mark(name) closes the previous stage and starts the next, so a script only needs one call per section.
+# started: perf_counter() at the top of the script; the time until the first mark becomes the "startup"
+# stage (imports on a cold start, the cached setup on later reruns)
+class RerunTimer:
+    def __init__(self, enabled, session=None, started=None):
+        self.enabled = enabled
+        self.session = session
+        self.stages = {}
+        self.started = self.current_start = started or time.perf_counter()
+        self.current = "startup" if started else None
+        if enabled and TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def mark(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.current is not None:
+            stage = {"seconds": round(now - self.current_start, 4)}
+            if tracemalloc.is_tracing():
+                stage["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            self.stages[self.current] = stage
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.current, self.current_start = name, time.perf_counter()
+
+    # Closes the last stage and writes the JSON line; returns the record
+    def finish(self, caches=None):
+        if not self.enabled:
+            return None
+        self.mark(None)
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "session": self.session,
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": self.stages,
+            "caches": caches or {},
+        }
+        line = json.dumps(record) + "\n"
+        with _lock, open(LOG_PATH, "a", encoding="utf-8") as handle:
+            handle.write(line)
+        return record
@@ -0,0 +1,126 @@
+# === Differential Expression ===
+# Two-group statistics for every protein at once, as array operations over the
+# (proteins x samples) intensity blocks of each side: log2 fold change, Welch
+# t-test, limma-style moderated t (empirical Bayes variance shrinkage) and
+# Benjamini-Hochberg q-values. Intensities are already log2, so the fold change
+# is a difference of means.
+import numpy as np
+import pandas as pd
+from scipy.special import digamma, polygamma, stdtr
+from data_store import PROTEIN_ID
+
+MIN_SAMPLES = 2  # Per side, for a protein to be tested
+
+
+# Per-row count, mean and sum of squared deviations, ignoring NaN
+def group_moments(values):
+    values = values.astype(np.float64)
+    valid = ~np.isnan(values)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, values, 0.0).sum(axis=1) / n
+    ss = np.where(valid, (values - mean[:, None]) ** 2, 0.0).sum(axis=1)
+    return n, mean, ss
+
+
+def two_sided_p(t, df):
+    return 2 * stdtr(df, -np.abs(t))
+
+
+# === WELCH ===
+def welch_t(n_a, mean_a, ss_a, n_b, mean_b, ss_b):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se_a = ss_a / (n_a - 1) / n_a
+        se_b = ss_b / (n_b - 1) / n_b
+        t = (mean_a - mean_b) / np.sqrt(se_a + se_b)
+        df = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+    return t, two_sided_p(t, df)
+
+
+# === MODERATED ===
+# Newton iteration for the inverse of the trigamma function (as in limma's trigammaInverse)
+def trigamma_inverse(x):
+    if x > 1e7:
+        return 1 / np.sqrt(x)
+    if x < 1e-6:
+        return 1 / x
+    y = 0.5 + 1 / x
+    for _ in range(50):
+        tri = polygamma(1, y)
+        step = tri * (1 - tri / x) / polygamma(2, y)
+        y += step
+        if -step / y < 1e-8:
+            break
+    return y
+
+
+# Prior degrees of freedom and variance from the spread of the residual variances (Smyth 2004)
+def fit_prior(s2, df):
+    ok = np.isfinite(s2) & (s2 > 0) & (df > 0)
+    if ok.sum() < 3:
+        return 0.0, 0.0
+    e = np.log(s2[ok]) - digamma(df[ok] / 2) + np.log(df[ok] / 2)
+    e_mean = e.mean()
+    e_var = e.var(ddof=1) - polygamma(1, df[ok] / 2).mean()
+    if e_var <= 0:
+        return np.inf, np.exp(e_mean)
+    d0 = 2 * trigamma_inverse(e_var)
+    return d0, np.exp(e_mean + digamma(d0 / 2) - np.log(d0 / 2))
+
+
+def moderated_t(n_a, mean_a, ss_a, n_b, mean_b, ss_b):
+    df = (n_a + n_b - 2).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s2 = (ss_a + ss_b) / df
+        d0, s0_sq = fit_prior(s2, df)
+        if np.isinf(d0):
+            post_s2, post_df = np.full_like(s2, s0_sq), np.full_like(df, np.inf)
+        else:
+            post_s2, post_df = (d0 * s0_sq + df * s2) / (d0 + df), d0 + df
+        t = (mean_a - mean_b) / np.sqrt(post_s2 * (1 / n_a + 1 / n_b))
+    return t, two_sided_p(t, post_df)
+
+
+# === MULTIPLE TESTING ===
+def bh_qvalues(p):
+    q = np.full(len(p), np.nan)
+    ok = ~np.isnan(p)
+    m = ok.sum()
+    if m:
+        order = np.argsort(p[ok])[::-1]
+        ranked = np.minimum.accumulate(p[ok][order] * m / np.arange(m, 0, -1))
+        q_ok = np.empty(m)
+        q_ok[order] = np.minimum(ranked, 1.0)
+        q[ok] = q_ok
+    return q
+
+
+# === CONTRAST ===
+# values_a / values_b: proteins x samples blocks for the two sides (A vs B, so log2FC > 0 is higher in A)
+def differential_expression(values_a, values_b):
+    n_a, mean_a, ss_a = group_moments(values_a)
+    n_b, mean_b, ss_b = group_moments(values_b)
+    tested = (n_a >= MIN_SAMPLES) & (n_b >= MIN_SAMPLES)
+
+    welch, welch_p = welch_t(n_a, mean_a, ss_a, n_b, mean_b, ss_b)
+    moderated, moderated_p = moderated_t(n_a, mean_a, ss_a, n_b, mean_b, ss_b)
+    welch_p = np.where(tested, welch_p, np.nan)
+    moderated_p = np.where(tested, moderated_p, np.nan)
+    return pd.DataFrame({
+        "log2FC": mean_a - mean_b,
+        "Mean A": mean_a, "Mean B": mean_b,
+        "n A": n_a, "n B": n_b,
+        "Welch t": np.where(tested, welch, np.nan), "Welch p": welch_p, "Welch q": bh_qvalues(welch_p),
+        "Moderated t": np.where(tested, moderated, np.nan), "Moderated p": moderated_p,
+        "Moderated q": bh_qvalues(moderated_p),
+    })
+
+
+# One row per protein (first row for duplicated IDs) with its names and class
+def contrast_table(matrix, master, labels_a, labels_b):
+    rows = np.fromiter(matrix.row_offsets.values(), dtype=np.intp)
+    offsets = matrix.sample_offsets
+    values_a = matrix.block(np.array([offsets[label] for label in labels_a], dtype=np.intp))[rows]
+    values_b = matrix.block(np.array([offsets[label] for label in labels_b], dtype=np.intp))[rows]
+    annotations = master[[PROTEIN_ID, "UniProt Protein Name", "Gene names", "Protein Class"]].iloc[rows]
+    return pd.concat([annotations.reset_index(drop=True), differential_expression(values_a, values_b)], axis=1)
@@ -0,0 +1,102 @@
+# === Filtered Data Export ===
+# Builds download files only when asked for, writing them chunk by chunk
+# to disk instead of serializing the whole selection into one string, and
+# keeps the most recent exports in a small LRU cache of files.
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+
+# Format name -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+CHUNK_ROWS = 20_000
+
+
+def iter_chunks(frame, columns, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows][columns]
+
+
+# === WRITE ===
+def write_export(frame, columns, fmt, path):
+    if fmt == "Parquet":
+        import pyarrow.parquet as pq  # Only loaded once a Parquet export is asked for
+        writer = None
+        for chunk in iter_chunks(frame, columns):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)  # One row group per chunk
+        if writer is None:  # Empty selection still gets a valid file
+            pq.write_table(pa.Table.from_pandas(frame[columns], preserve_index=False), path)
+        else:
+            writer.close()
+        return path
+
+    opener = gzip.open if fmt == "CSV (gzip)" else open
+    with opener(path, "wt", encoding="utf-8", newline="") as handle:
+        frame.iloc[:0][columns].to_csv(handle, index=False)
+        for chunk in iter_chunks(frame, columns):
+            chunk.to_csv(handle, index=False, header=False)
+    return path
+
+
+# === CACHE ===
+class ExportCache:
+    def __init__(self, directory, max_entries=8, max_bytes=512 * 1024 ** 2):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (path, size), least recently used first
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        self.building = {}  # key -> Event set once the export being built for it is in place
+        os.makedirs(directory, exist_ok=True)
+
+    # Open binary handle on the cached export for key, built with build(path) on a miss.
+    # The handle is opened under the lock, so evicting the file afterwards can't cut off the reader.
+    def open(self, key, fmt, build):
+        while True:
+            with self.lock:
+                if key in self.entries and os.path.exists(self.entries[key][0]):
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return open(self.entries[key][0], "rb")
+                building = self.building.get(key)
+                if building is None:
+                    self.misses += 1
+                    self.building[key] = threading.Event()
+                    break
+            building.wait()  # Same export already being built by another session; a failed build is retried here
+
+        # Built outside the lock, so other exports are still served meanwhile
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()  # Not hash(): that is salted per process
+        path = os.path.join(self.directory, f"export_{digest}{EXPORT_FORMATS[fmt][0]}")
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            build(partial)
+            with self.lock:
+                os.replace(partial, path)
+                self.entries[key] = (path, os.path.getsize(path))
+                handle = open(path, "rb")
+                self._evict()
+            return handle
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+            with self.lock:
+                self.building.pop(key).set()
+
+    def _evict(self):
+        while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries or
+                sum(size for _, size in self.entries.values()) > self.max_bytes):
+            _, (path, _) = self.entries.popitem(last=False)
+            if os.path.exists(path):
+                os.remove(path)
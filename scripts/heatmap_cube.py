@@ -0,0 +1,89 @@
+# === Group-Mean Cube for the Heatmap Explorer ===
+# Per-protein x per-group intensity sums and counts, so a class or custom
+# protein heatmap is a row gather instead of a melt/groupby/pivot. Sessions
+# keep their own copy for the current sample filter and update it by adding
+# or subtracting only the samples whose selection changed.
+import numpy as np
+import pandas as pd
+
+
+def group_totals(values, codes, n_groups):
+    # NaN-aware per-group sums and counts as two matrix products with a one-hot sample -> group map
+    onehot = np.zeros((len(codes), n_groups))
+    onehot[np.arange(len(codes)), codes] = 1.0
+    valid = ~np.isnan(values)
+    sums = np.where(valid, values, 0).astype(np.float64) @ onehot
+    counts = valid.astype(np.float64) @ onehot
+    return sums, counts.astype(np.int32)
+
+
+class CubeState:
+    def __init__(self, mask, sums, counts):
+        self.mask = mask        # Selected samples (matrix column order)
+        self.sums = sums        # proteins x groups
+        self.counts = counts    # proteins x groups
+
+
+class GroupMeanCube:
+    def __init__(self, matrix, master):
+        self.matrix = matrix
+        self.n_groups = len(matrix.group_names)
+
+        # Heatmap rows are UniProt names; proteins sharing a name are pooled like the old groupby
+        self.name_codes, self.names = pd.factorize(master["UniProt Protein Name"], sort=True)
+        self.names = np.asarray(self.names, dtype=object)
+
+        classes = master["Protein Class"].astype(object)
+        self.class_rows = {cls: np.flatnonzero((classes == cls).to_numpy()) for cls in classes.dropna().unique()}
+        self.classes = sorted(self.class_rows)
+
+        self.full_totals = None  # All-sample totals, summed on first use
+
+    # State for a session that has every sample selected
+    def full_state(self):
+        n_samples = len(self.matrix.sample_labels)
+        if self.full_totals is None:
+            self.full_totals = self._totals(np.arange(n_samples))
+        sums, counts = self.full_totals
+        return CubeState(np.ones(n_samples, dtype=bool), sums.copy(), counts.copy())
+
+    # Bring a session state in line with a new sample selection
+    def update(self, state, sample_columns):
+        mask = np.zeros_like(state.mask)
+        mask[sample_columns] = True
+        added = np.flatnonzero(mask & ~state.mask)
+        removed = np.flatnonzero(state.mask & ~mask)
+        if len(added) + len(removed) > mask.sum():
+            # Fewer samples to sum from scratch than to patch
+            state.sums, state.counts = self._totals(np.flatnonzero(mask))
+        else:
+            for cols, sign in ((added, 1), (removed, -1)):
+                if len(cols):
+                    sums, counts = self._totals(cols)
+                    state.sums += sign * sums
+                    state.counts += sign * counts
+            state.sums[state.counts == 0] = 0.0  # Drop float residue from repeated add/subtract
+        state.mask = mask
+        return state
+
+    def _totals(self, cols):
+        # Imputed values, so every group mean is over all of its selected samples
+        return group_totals(self.matrix.block(cols, imputed=True), self.matrix.group_codes[cols], self.n_groups)
+
+    # Mean matrix (protein name x group) for the given protein rows, groups limited to the selection
+    def heatmap_matrix(self, state, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        rows = rows[self.name_codes[rows] >= 0]  # Proteins without a UniProt name have no heatmap row
+        name_index, inverse = np.unique(self.name_codes[rows], return_inverse=True)
+        sums = np.zeros((len(name_index), self.n_groups))
+        counts = np.zeros((len(name_index), self.n_groups))
+        np.add.at(sums, inverse, state.sums[rows])
+        np.add.at(counts, inverse, state.counts[rows])
+
+        groups = np.unique(self.matrix.group_codes[state.mask])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums[:, groups] / counts[:, groups]
+        heatmap = pd.DataFrame(means, index=self.names[name_index], columns=self.matrix.group_names[groups])
+        heatmap.index.name = "UniProt Protein Name"
+        heatmap.columns.name = "Group"
+        return heatmap
@@ -0,0 +1,51 @@
+# === Heatmap Rendering ===
+# Plotly figure for a (protein name x group) mean matrix, drawn as one heatmap
+# trace instead of a rasterized Matplotlib figure. Past MAX_DISPLAY_ROWS,
+# consecutive rows are averaged into bins; after clustering, neighbouring
+# rows have similar profiles, so the bins keep the overall pattern.
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MAX_DISPLAY_ROWS = 300
+ROW_HEIGHT = 16         # Pixels per displayed row, between MIN_HEIGHT and MAX_HEIGHT
+MIN_HEIGHT, MAX_HEIGHT = 450, 1100
+COLORSCALE = "RdBu_r"   # Diverging, blue low / red high like seaborn's coolwarm
+
+
+# Mean of consecutive rows in at most max_rows bins; bins are labelled by their first protein and size
+def downsample_rows(heatmap, max_rows=MAX_DISPLAY_ROWS):
+    if len(heatmap) <= max_rows:
+        return heatmap
+    starts = np.array([bin_rows[0] for bin_rows in np.array_split(np.arange(len(heatmap)), max_rows)])
+    values = heatmap.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    sizes = np.diff(np.append(starts, len(heatmap)))
+    labels = [f"{heatmap.index[start]} (+{size - 1} more)" for start, size in zip(starts, sizes)]
+    binned = pd.DataFrame(means, index=labels, columns=heatmap.columns)
+    binned.index.name, binned.columns.name = heatmap.index.name, heatmap.columns.name
+    return binned
+
+
+# zrange: (zmin, zmax) for a fixed color scale, or None to fit the data
+def heatmap_figure(heatmap, title, zrange=None, max_rows=MAX_DISPLAY_ROWS):
+    shown = downsample_rows(heatmap, max_rows)
+    if len(shown) < len(heatmap):
+        title = f"{title} ({len(heatmap)} proteins averaged into {len(shown)} rows)"
+    zmin, zmax = zrange or (None, None)
+    fig = go.Figure(go.Heatmap(
+        z=shown.to_numpy(), x=shown.columns.astype(str), y=shown.index.astype(str),
+        colorscale=COLORSCALE, zmid=None if zrange else 0, zmin=zmin, zmax=zmax,
+        colorbar={"title": {"text": "Log2 Intensity"}}, hoverongaps=False,
+        hovertemplate="%{y}<br>Group: %{x}<br>Mean: %{z:.3f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title, height=int(np.clip(ROW_HEIGHT * len(shown) + 200, MIN_HEIGHT, MAX_HEIGHT)),
+        xaxis={"title": "Group", "tickangle": -45},
+        yaxis={"title": "Protein Name", "autorange": "reversed", "showticklabels": len(shown) <= 80},
+    )
+    return fig
@@ -0,0 +1,142 @@
+# === Batch Ingestion of Several Studies ===
+# Cleans many TMT/DDA exports in parallel (one process per file) and merges them
+# into one partitioned atlas store:
+#
+#   cleaned/atlas/proteins.arrow                 union of protein IDs + annotation columns (first study wins)
+#   cleaned/atlas/samples/<study>/<group>.arrow  intensity columns, rows aligned to proteins.arrow
+#   cleaned/atlas/sample_partitions.csv          TMT_Label -> partition (see sample_store.py)
+#   cleaned/atlas/mapping_table.*                all sample mappings, namespaced by a Study column
+#   cleaned/atlas/uniprot_id_to_name_mapping.*,  UniProt names and protein classes of the merged proteins,
+#   cleaned/atlas/protein_class_mapping.*        resolved like the pipeline's annotate/classify stages
+#
+# The result is a complete data directory: AtlasEngine, atlas_api.py --data and the dashboard
+# (FUSARIUM_DATA_DIR) open it like cleaned/.
+#
+#   python scripts/ingest.py data/                 every .txt/.tsv export in a directory
+#   python scripts/ingest.py datasets.csv          manifest: study,path[,metadata_rows,trailing_cols]
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import cleaning
+import protein_classifier
+import uniprot_annotation_script
+from data_store import cleaned_dir, read_store, read_store_columns, store_column_names, store_path, write_store, PROTEIN_ID
+from sample_store import safe_name, sample_rows, write_study_partitions, write_partition_index
+
+atlas_dir = os.path.join(cleaned_dir, "atlas")
+studies_build_dir = os.path.join(cleaned_dir, ".build", "studies")
+EXPORT_EXTS = (".txt", ".tsv")
+NAMESPACED_COLUMNS = ["Sample_Code", "TMT_Label"]  # Made unique across studies as "<study>:<value>"
+
+
+# === DATASET LIST ===
+# One row per export: study, path, metadata_rows, trailing_cols
+def read_datasets(source):
+    if os.path.isdir(source):
+        files = sorted(name for name in os.listdir(source) if name.endswith(EXPORT_EXTS))
+        datasets = pd.DataFrame({
+            "study": [safe_name(os.path.splitext(name)[0]) for name in files],
+            "path": [os.path.join(source, name) for name in files],
+        })
+    else:
+        datasets = pd.read_csv(source, dtype={"study": str, "path": str})
+        datasets["study"] = datasets["study"].map(study_name)
+        base = os.path.dirname(os.path.abspath(source))  # Manifest paths are relative to the manifest
+        datasets["path"] = [path if os.path.isabs(path) else os.path.join(base, path) for path in datasets["path"]]
+
+    for col, default in [("metadata_rows", cleaning.N_METADATA_ROWS), ("trailing_cols", cleaning.N_TRAILING_COLS)]:
+        datasets[col] = datasets[col].fillna(default).astype(int) if col in datasets else default
+    if datasets["study"].duplicated().any():
+        raise ValueError(f"Duplicate study names: {sorted(datasets.loc[datasets['study'].duplicated(), 'study'])}")
+    return datasets
+
+
+# === WORKERS ===
+# Both run in pool processes, so they only take and return picklable values
+def clean_study(study, path, metadata_rows, trailing_cols, chunk_rows):
+    study_dir = os.path.join(studies_build_dir, study)
+    mapping_df = cleaning.clean_file(path, study_dir, chunk_rows=chunk_rows, cache_dir=os.path.join(study_dir, "parts"),
+                                     n_metadata_rows=metadata_rows, n_trailing_cols=trailing_cols, write_csv=False)
+    return harmonize_mapping(study, mapping_df)
+
+
+# Reindex a study's intensity columns onto the atlas protein order (proteins it lacks become NaN)
+# and write them as one partition per group; returns the partition index rows
+def align_study(study, sample_map, protein_ids, out_dir):
+    frame = read_store(store_path("cleaned_data", os.path.join(studies_build_dir, study)))
+    sample_map = sample_map[sample_map["Original_Column"].isin(frame.columns)]
+    frame = frame.loc[~frame.index.duplicated(), sample_map["Original_Column"]]  # First row wins
+    frame = frame.reindex(pd.Index(protein_ids, name=PROTEIN_ID))
+    return write_study_partitions(frame, sample_map, out_dir, study)
+
+
+# === HARMONIZE ===
+def harmonize_mapping(study, mapping_df):
+    mapping = mapping_df.copy()
+    for col in ["Sample_Code", "Group", "Cultivar_Treatment"]:
+        mapping[col] = mapping[col].str.strip()
+    for col in NAMESPACED_COLUMNS:
+        mapping[col] = study + ":" + mapping[col]
+    mapping.insert(0, "Study", study)
+    return mapping
+
+
+# Union of protein IDs in study order, plus each protein's annotation columns from the first study that has it
+def merge_proteins(mappings):
+    frames = []
+    for study, mapping in mappings.items():
+        path = store_path("cleaned_data", os.path.join(studies_build_dir, study))
+        sample_cols = set(mapping["Original_Column"])
+        frames.append(read_store_columns(path, [col for col in store_column_names(path) if col not in sample_cols]))
+    proteins = pd.concat(frames, ignore_index=True)
+    return proteins.drop_duplicates(PROTEIN_ID).reset_index(drop=True)
+
+
+# === INGEST ===
+# fetcher / cache_file: UniProt lookup for names missing from the annotation cache (see annotate_ids)
+def ingest(source, out_dir=atlas_dir, chunk_rows=cleaning.CHUNK_ROWS, workers=None, fetcher=None,
+           cache_file=uniprot_annotation_script.cache_path):
+    datasets = read_datasets(source)
+    if datasets.empty:
+        raise FileNotFoundError(f"No exports found in {source}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        cleaned = pool.map(clean_study, datasets["study"], datasets["path"], datasets["metadata_rows"],
+                           datasets["trailing_cols"], [chunk_rows] * len(datasets))
+        mappings = dict(zip(datasets["study"], cleaned))
+
+        proteins = merge_proteins(mappings)
+        protein_ids = proteins[PROTEIN_ID].to_numpy()
+        sample_maps = [sample_rows(mapping) for mapping in mappings.values()]
+        partitions = list(pool.map(align_study, list(mappings), sample_maps, [protein_ids] * len(mappings),
+                                   [out_dir] * len(mappings)))
+
+    write_store(proteins, "proteins", index=PROTEIN_ID, directory=out_dir)
+    mapping_df = pd.concat(mappings.values(), ignore_index=True)
+    mapping_df.to_csv(os.path.join(out_dir, "mapping_table.csv"), index=False)
+    write_store(mapping_df, "mapping_table", categorical_columns=["Study", "Group", "Cultivar_Treatment"],
+                directory=out_dir)
+    write_partition_index(pd.concat(partitions, ignore_index=True), out_dir)  # Also drops partitions of removed studies
+
+    uniprot_annotation_script.extract_unique_ids(out_dir)
+    uniprot_annotation_script.annotate_ids(out_dir, fetcher, cache_file)
+    protein_classifier.classify_proteins(out_dir)
+    cleaning.convert_annotation_tables(out_dir)
+    print(f"✅ Atlas of {len(mappings)} studies, {len(proteins)} proteins, {len(mapping_df)} samples:", out_dir)
+    return mapping_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean several exports in parallel and merge them into one atlas store.")
+    parser.add_argument("source", help="Directory of .txt/.tsv exports, or a CSV manifest (study,path[,metadata_rows,trailing_cols])")
+    parser.add_argument("--out", default=atlas_dir, help="Output directory of the merged store")
+    parser.add_argument("--chunk-rows", type=int, default=cleaning.CHUNK_ROWS, help="Target rows per cleaned partition")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--annotation-source", choices=["cache", "uniprot", "flatfile"], default="cache",
+                        help="Where to look up UniProt accessions missing from the local annotation cache")
+    parser.add_argument("--flat-file", help="UniProt TSV dump used with --annotation-source flatfile")
+    args = parser.parse_args()
+    ingest(args.source, args.out, args.chunk_rows, args.workers,
+           uniprot_annotation_script.make_fetcher(args.annotation_source, args.flat_file))
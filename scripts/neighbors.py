@@ -0,0 +1,103 @@
+# === Protein Correlation Neighbors ===
+# Offline top-k "proteins like this one" index. Every protein's profile over
+# all samples is z-scored and scaled to unit length (float32), so a block of
+# rows times the whole matrix gives Pearson correlations with everything; only
+# the k best per row are kept. Blocks run on a thread pool (the products and
+# the top-k selection release the GIL), so memory stays at
+# workers x BLOCK_ROWS x proteins floats and all cores are used.
+#
+#   <data>/protein_neighbors.arrow   per cleaned_data row: protein ID, neighbor rows, correlations
+#
+# Missing values count as the protein's mean, so correlations over sparse
+# profiles are approximate; proteins with fewer than MIN_VALUES values get none.
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from data_store import cleaned_dir, find_protein_table, read_store_columns, read_table_columns, store_path, write_store, PROTEIN_ID
+from sample_store import SampleStore, ensure_partitions
+
+NEIGHBORS_NAME = "protein_neighbors"
+TOP_K = 25
+BLOCK_ROWS = 512
+MIN_VALUES = 6
+
+
+def neighbor_columns(k):
+    return [f"Neighbor {i}" for i in range(1, k + 1)], [f"Correlation {i}" for i in range(1, k + 1)]
+
+
+# Rows z-scored and scaled to unit norm, so a dot product is a correlation; rows without enough values are 0
+def unit_rows(values):
+    from clustering import zscore_rows  # Build-time only; the dashboard just reads the index
+    x = zscore_rows(values)
+    norms = np.linalg.norm(x, axis=1)
+    eligible = ((~np.isnan(values)).sum(axis=1) >= MIN_VALUES) & (norms > 0)
+    x[eligible] /= norms[eligible, None]
+    x[~eligible] = 0
+    return x, eligible
+
+
+# === BUILD ===
+# (neighbor rows, correlations), each proteins x k, best first; -1 / NaN where a row has no neighbors
+def build_neighbors(values, k=TOP_K, block_rows=BLOCK_ROWS, workers=None):
+    x, eligible = unit_rows(values)
+    n = len(x)
+    k = max(0, min(k, int(eligible.sum()) - 1))
+    rows = np.full((n, k), -1, dtype=np.int32)
+    corr = np.full((n, k), np.nan, dtype=np.float32)
+    if k == 0:
+        return rows, corr
+
+    def run(start):
+        stop = min(n, start + block_rows)
+        sims = x[start:stop] @ x.T
+        sims[:, ~eligible] = -np.inf
+        sims[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Not its own neighbor
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        rows[start:stop] = np.take_along_axis(top, order, axis=1)
+        corr[start:stop] = np.take_along_axis(top_sims, order, axis=1)
+
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        list(pool.map(run, range(0, n, block_rows)))
+    rows[~eligible], corr[~eligible] = -1, np.nan
+    return rows, corr
+
+
+def build_neighbor_index(directory=cleaned_dir, k=TOP_K, block_rows=BLOCK_ROWS, workers=None):
+    ensure_partitions(directory)
+    store = SampleStore(directory)
+    protein_ids = read_table_columns(find_protein_table(directory), [PROTEIN_ID])[PROTEIN_ID]
+    rows, corr = build_neighbors(store.block(store.labels), k, block_rows, workers)
+    row_cols, corr_cols = neighbor_columns(rows.shape[1])
+    frame = pd.concat([protein_ids.reset_index(drop=True), pd.DataFrame(rows, columns=row_cols),
+                       pd.DataFrame(corr, columns=corr_cols)], axis=1)
+    path = write_store(frame, NEIGHBORS_NAME, directory=directory)
+    print(f"✅ Top-{rows.shape[1]} correlation neighbors for {len(frame):,} proteins:", path)
+    return path
+
+
+# === READ ===
+# (neighbor rows, correlations) aligned with protein_ids (cleaned_data row order), or None when
+# the index is missing or was built from another version of cleaned_data
+def read_neighbors(directory, protein_ids):
+    path = store_path(NEIGHBORS_NAME, directory)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(find_protein_table(directory)):
+        return None
+    frame = read_store_columns(path, None)
+    if len(frame) != len(protein_ids) or not (frame[PROTEIN_ID].to_numpy() == protein_ids).all():
+        return None
+    row_cols, corr_cols = neighbor_columns((frame.shape[1] - 1) // 2)
+    return frame[row_cols].to_numpy(dtype=np.int32), frame[corr_cols].to_numpy(dtype=np.float32)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the top-k protein correlation neighbor index in cleaned/.")
+    parser.add_argument("--k", type=int, default=TOP_K, help="Neighbors kept per protein")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="Proteins per matrix product")
+    parser.add_argument("--workers", type=int, help="Threads (default: all cores)")
+    args = parser.parse_args()
+    build_neighbor_index(cleaned_dir, args.k, args.block_rows, args.workers)
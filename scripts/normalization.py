@@ -0,0 +1,131 @@
+# === Normalization and Imputation ===
+# Runs once per study when the sample partitions are written, over the whole
+# proteins x samples matrix:
+#   1. per-TMT-plex normalization ("median": channel medians aligned; "quantile":
+#      channels of a plex share one intensity distribution), then every plex is
+#      shifted to the same overall median so plexes are comparable;
+#   2. left-censored imputation: missing values of proteins measured in the study
+#      are drawn from a narrow normal distribution below each sample's observed
+#      values (Perseus' "replace missing values from normal distribution" defaults,
+#      width 0.3, down shift 1.8);
+#   3. per-sample validity: samples with too few observed values (among the proteins
+#      measured in the study) are flagged.
+# Observed values keep NaN where nothing was measured, so the value-level mask
+# is simply ~isnan; the imputed copy is only used where every sample needs a value.
+# The plex is the last number of the original column, e.g. "Reporter intensity corrected 3 1" -> 1.
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+NORMALIZATION = "median"        # "median", "quantile" or None
+IMPUTE = True
+IMPUTE_WIDTH, IMPUTE_SHIFT = 0.3, 1.8   # In standard deviations of the sample's observed values
+MIN_OBSERVED_FRACTION = 0.2     # Samples with fewer observed proteins are flagged as not valid
+PLEX_RE = re.compile(r"(\d+)\s*$")
+
+
+def plex_of(column):
+    match = PLEX_RE.search(str(column))
+    return match.group(1) if match else "1"
+
+
+# === NORMALIZE ===
+# NaN medians for empty columns / blocks, without nanmedian's all-NaN warnings
+def column_medians(block):
+    medians = np.full(block.shape[1], np.nan)
+    measured = ~np.isnan(block).all(axis=0)
+    if block.shape[0] and measured.any():
+        medians[measured] = np.nanmedian(block[:, measured], axis=0)
+    return medians
+
+
+def overall_median(block):
+    values = block[~np.isnan(block)]
+    return np.median(values) if len(values) else np.nan
+
+
+def median_normalize(block):
+    return block - column_medians(block) + overall_median(block)
+
+
+# Each observed value is replaced by the mean distribution's value at its quantile within its channel
+def quantile_normalize(block):
+    from scipy.stats import rankdata  # scipy.stats takes about a second to import; the default is "median"
+    out = np.full_like(block, np.nan)
+    valid = ~np.isnan(block)
+    grid = np.linspace(0, 1, max(2, int(valid.sum(axis=0).max())))
+    columns = [np.sort(block[valid[:, j], j]) for j in range(block.shape[1])]
+    if not any(len(col) > 1 for col in columns):
+        return block.copy()
+    reference = np.mean([np.interp(grid, np.linspace(0, 1, len(col)), col) for col in columns if len(col) > 1], axis=0)
+    for j in range(block.shape[1]):
+        n = valid[:, j].sum()
+        if n > 1:
+            quantiles = (rankdata(block[valid[:, j], j]) - 1) / (n - 1)
+            out[valid[:, j], j] = np.interp(quantiles, grid, reference)
+        else:
+            out[valid[:, j], j] = block[valid[:, j], j]
+    return out
+
+
+NORMALIZERS = {"median": median_normalize, "quantile": quantile_normalize}
+
+
+# === IMPUTE ===
+# Seeded per sample label, so rebuilding the same data gives the same values. Only rows in
+# measured are filled; a protein never seen in the study is absent, not low.
+def impute_left_censored(values, label, measured):
+    observed = values[~np.isnan(values)]
+    if len(observed) < 2:
+        return values.copy()
+    rng = np.random.default_rng(zlib.crc32(str(label).encode("utf-8")))
+    mean, sd = observed.mean(), observed.std()
+    missing = np.isnan(values) & measured
+    imputed = values.copy()
+    imputed[missing] = rng.normal(mean - IMPUTE_SHIFT * sd, IMPUTE_WIDTH * sd, missing.sum())
+    return imputed
+
+
+# === RUN ===
+# frame: proteins x Original_Column float32; sample_map: rows for those columns (Original_Column, TMT_Label).
+# Returns (normalized observed values, imputed values or None, per-sample Observed / Valid frame),
+# all with the frame's columns; plexes are processed in parallel.
+def preprocess(frame, sample_map, normalization=NORMALIZATION, impute=IMPUTE, workers=None):
+    values = frame.to_numpy(dtype=np.float32)
+    plexes = pd.Series([plex_of(col) for col in frame.columns])
+    normalized = np.empty_like(values)
+    imputed = np.empty_like(values) if impute else None
+    labels = sample_map.set_index("Original_Column")["TMT_Label"].reindex(frame.columns).to_numpy()
+    measured = ~np.isnan(values).all(axis=1)
+
+    def run(plex):
+        cols = np.flatnonzero((plexes == plex).to_numpy())
+        block = values[:, cols].astype(np.float64)
+        if normalization:
+            block = NORMALIZERS[normalization](block)
+        normalized[:, cols] = block
+        if impute:
+            for j, col in enumerate(cols):
+                imputed[:, col] = impute_left_censored(block[:, j], labels[col], measured)
+
+    with ThreadPoolExecutor(workers or min(4, os.cpu_count() or 1)) as pool:
+        list(pool.map(run, plexes.unique()))
+
+    if normalization and len(plexes.unique()) > 1:
+        # Plex medians aligned to the overall median, so plexes are comparable
+        target = overall_median(normalized)
+        for plex in plexes.unique():
+            cols = np.flatnonzero((plexes == plex).to_numpy())
+            shift = np.nan_to_num(target - overall_median(normalized[:, cols]))
+            normalized[:, cols] += shift
+            if impute:
+                imputed[:, cols] += shift
+
+    # Over the proteins the study measured, so rows added by aligning to the atlas protein union don't count
+    observed = (~np.isnan(values[measured])).mean(axis=0) if measured.any() else np.zeros(values.shape[1])
+    quality = pd.DataFrame({"Observed": observed.round(4), "Valid": observed >= MIN_OBSERVED_FRACTION}, index=frame.columns)
+    as_frame = lambda array: pd.DataFrame(array, columns=frame.columns, index=frame.index)
+    return as_frame(normalized), as_frame(imputed) if impute else None, quality
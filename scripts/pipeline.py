@@ -0,0 +1,160 @@
+# === Incremental Build of the cleaned/ Artifacts ===
+# One entry point for the whole ingestion pipeline. Every stage is keyed on
+# the content hashes of its inputs and is skipped when that key and its
+# outputs are unchanged since the last run; the cleaning stage additionally
+# reuses cleaned row partitions whose raw bytes did not change. The finished
+# files are then published as the current dataset snapshot (see snapshots.py).
+#
+#   python scripts/pipeline.py [--raw data/proteomics_data.txt] [--annotation-source cache] [--force]
+import argparse
+import hashlib
+import json
+import os
+import cleaning
+import neighbors
+import normalization
+import protein_classifier
+import sample_store
+import snapshots
+import uniprot_annotation_script
+from data_store import cleaned_dir
+
+build_dir = os.path.join(cleaned_dir, ".build")
+state_path = os.path.join(build_dir, "state.json")
+parts_dir = os.path.join(build_dir, "parts")
+normalization_path = os.path.abspath(normalization.__file__)  # Settings live in the module, so edits rebuild the partitions
+
+
+class Stage:
+    def __init__(self, name, inputs, outputs, run, params=()):
+        self.name = name
+        self.inputs = inputs      # Paths whose content decides whether the stage reruns
+        self.outputs = outputs    # Paths the stage writes
+        self.run = run
+        self.params = params      # Settings that also decide it (e.g. where annotations come from)
+
+
+# === HASHING ===
+# sha256 of a file, memoized in the build state by (size, mtime) so unchanged files are not re-read
+def file_digest(path, state):
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    cached = state["digests"].get(path)
+    if cached and cached["stamp"] == stamp:
+        return cached["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    state["digests"][path] = {"stamp": stamp, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def stage_key(stage, state):
+    key = hashlib.sha256(stage.name.encode("utf-8"))
+    for param in stage.params:
+        key.update(str(param).encode("utf-8"))
+    for path in stage.inputs:
+        key.update(path.encode("utf-8"))
+        key.update(file_digest(path, state).encode("utf-8") if os.path.exists(path) else b"missing")
+    return key.hexdigest()
+
+
+def output_stamps(stage):
+    stamps = {}
+    for path in stage.outputs:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stamps[path] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+# === STATE ===
+def load_state():
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as handle:
+            return json.load(handle)
+    return {"digests": {}, "stages": {}}
+
+
+def save_state(state):
+    os.makedirs(build_dir, exist_ok=True)
+    with open(state_path + ".tmp", "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=1)
+    os.replace(state_path + ".tmp", state_path)
+
+
+# === RUN ===
+def run_stages(stages, force=False):
+    state = load_state()
+    for stage in stages:
+        key = stage_key(stage, state)
+        previous = state["stages"].get(stage.name, {})
+        up_to_date = (previous.get("key") == key and previous.get("outputs") == output_stamps(stage)
+                      and all(os.path.exists(path) for path in stage.outputs))
+        if up_to_date and not force:
+            print(f"⏭️ {stage.name}: up to date")
+            continue
+
+        print(f"▶️ {stage.name}")
+        stage.run()
+        state["stages"][stage.name] = {"key": key, "outputs": output_stamps(stage)}
+        save_state(state)  # Saved per stage so an interrupted run keeps finished work
+    return state
+
+
+# Snapshot of the built files, hashed with the digests the stages already keep; unchanged data keeps its version
+def publish(state, directory=cleaned_dir):
+    version = snapshots.publish_snapshot(directory, digest=lambda path: file_digest(path, state))
+    save_state(state)
+    return version
+
+
+def pipeline_stages(raw_path, chunk_rows=cleaning.CHUNK_ROWS, annotation_source="cache", flat_file=None):
+    out = lambda name: os.path.join(cleaned_dir, name)
+    fetcher = uniprot_annotation_script.make_fetcher(annotation_source, flat_file)
+    flat_file = os.path.abspath(flat_file) if annotation_source == "flatfile" and flat_file else None
+    return [
+        Stage("clean", [raw_path],
+              [out("cleaned_data.csv"), out("cleaned_data.arrow"), out("mapping_table.csv"), out("mapping_table.arrow")],
+              lambda: cleaning.clean_file(raw_path, cleaned_dir, chunk_rows=chunk_rows, cache_dir=parts_dir)),
+        Stage("partition", [out("cleaned_data.arrow"), out("mapping_table.arrow"), normalization_path],
+              [out(sample_store.INDEX_FILE)],
+              lambda: sample_store.partition_cleaned(cleaned_dir)),
+        Stage("neighbors", [out("cleaned_data.arrow"), out("mapping_table.arrow"), normalization_path],
+              [out("protein_neighbors.arrow")],
+              lambda: neighbors.build_neighbor_index(cleaned_dir)),
+        Stage("unique_ids", [out("cleaned_data.arrow")], [out("unique_uniprot_ids.csv")],
+              lambda: uniprot_annotation_script.extract_unique_ids(cleaned_dir)),
+        # Keyed on the lookup source too, so switching from the offline cache to UniProt or a new
+        # flat file fetches the names still missing
+        Stage("annotate", [out("unique_uniprot_ids.csv")] + ([flat_file] if flat_file else []),
+              [out("uniprot_id_to_name_mapping.tsv.gz")],
+              lambda: uniprot_annotation_script.annotate_ids(cleaned_dir, fetcher),
+              params=(annotation_source, flat_file)),
+        Stage("classify",
+              [out("unique_uniprot_ids.csv"), out("uniprot_id_to_name_mapping.tsv.gz"), out("cleaned_data.arrow"),
+               protein_classifier.overrides_path],
+              [out("protein_class_mapping.csv")],
+              lambda: protein_classifier.classify_proteins(cleaned_dir),
+              params=(protein_classifier.MATCH_COLUMNS,)),
+        Stage("class_store", [out("protein_class_mapping.csv")], [out("protein_class_mapping.arrow")],
+              lambda: cleaning.convert_class_table(cleaned_dir)),
+        Stage("uniprot_store", [out("uniprot_id_to_name_mapping.tsv.gz")], [out("uniprot_id_to_name_mapping.arrow")],
+              lambda: cleaning.convert_uniprot_table(cleaned_dir)),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the cleaned/ artifacts, skipping up-to-date stages.")
+    parser.add_argument("--raw", default=cleaning.data_path, help="Raw MaxQuant/Perseus export (tab-separated)")
+    parser.add_argument("--chunk-rows", type=int, default=cleaning.CHUNK_ROWS, help="Target rows per cleaned partition")
+    parser.add_argument("--annotation-source", choices=["cache", "uniprot", "flatfile"], default="cache",
+                        help="Where to look up UniProt accessions missing from the local annotation cache")
+    parser.add_argument("--flat-file", help="UniProt TSV dump used with --annotation-source flatfile")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage")
+    args = parser.parse_args()
+    stages = pipeline_stages(os.path.abspath(args.raw), args.chunk_rows, args.annotation_source, args.flat_file)
+    state = run_stages(stages, force=args.force)
+    print(f"📦 Dataset version {publish(state)}")
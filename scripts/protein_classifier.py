@@ -0,0 +1,137 @@
+# === Rule-based Protein Classifier ===
+# Regenerates protein_class_mapping.csv from UniProt protein names, optionally
+# with the Keywords/GO columns of the cleaned data. Each class is one compiled
+# regex applied to the whole annotation table at once; classes are tried in
+# priority order and curated exceptions come from an override table.
+#
+# The override table only holds the accessions where the rules disagree with
+# the curated classes, so it is tied to the columns the rules match against:
+# after changing MATCH_COLUMNS, rederive it with --derive-from.
+import argparse
+import os
+import re
+import numpy as np
+import pandas as pd
+from data_store import cleaned_dir, find_protein_table, find_table, read_table, read_store_columns, store_column_names, STORE_EXT, PROTEIN_ID
+
+# Class -> name/keyword/GO patterns, highest priority first
+CLASS_RULES = {
+    "Mycotoxin-related": [
+        r"trichothecene", r"deoxynivalenol", r"mycotoxin", r"zearalenone", r"fumonisin",
+    ],
+    "Kinase": [
+        r"kinase", r"\bEC 2\.7\.(?:1[01]|[1-4])\.",
+    ],
+    "Transporter": [
+        r"transport", r"porter\b", r"permease", r"importin", r"exportin", r"karyopherin",
+    ],
+    "Stress-response": [
+        r"heat shock", r"pathogenesis-related", r"\bstress", r"wheatwin", r"thaumatin", r"dehydrin",
+        r"hypersensitive", r"response to (?:stress|heat|fungus|wounding)",
+    ],
+    "Housekeeping": [
+        r"ribosomal protein", r"ribosomal subunit", r"\btranslation", r"translationally",
+    ],
+}
+DEFAULT_CLASS = "Other"
+# Cleaned-data annotation columns that can be searched alongside the UniProt name, when present
+ANNOTATION_COLUMNS = ["Keywords", "Gene ontology (biological process)", "Gene ontology (cellular component)"]
+# Columns the rules are matched against; the shipped overrides were derived against the names only
+MATCH_COLUMNS = ["Protein names"]
+overrides_path = os.path.join(cleaned_dir, "protein_class_overrides.csv")
+
+
+def compile_rules(rules=CLASS_RULES):
+    return {cls: re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+            for cls, patterns in rules.items()}
+
+
+# Vectorized: one regex pass per class over all texts, first matching class wins
+def classify(texts, compiled=None):
+    compiled = compiled or compile_rules()
+    texts = texts.fillna("").astype(str)
+    conditions = [texts.str.contains(pattern, regex=True).to_numpy(dtype=bool) for pattern in compiled.values()]
+    return pd.Series(np.select(conditions, list(compiled), default=DEFAULT_CLASS), index=texts.index)
+
+
+# === BUILD TABLE ===
+# ids: accessions to classify; uniprot_map: From/Protein names; annotations: PROTEIN_ID + annotation columns.
+# Only match_columns are searched, whatever else annotations holds.
+def build_class_table(ids, uniprot_map, annotations=None, overrides=None, match_columns=MATCH_COLUMNS):
+    names = uniprot_map.drop_duplicates("From").set_index("From")["Protein names"]
+    table = pd.DataFrame({"UniProt ID": pd.Series(ids, dtype=object).drop_duplicates().to_numpy()})
+    table["Protein names"] = table["UniProt ID"].map(names)
+
+    texts = table["Protein names"].fillna("") if "Protein names" in match_columns else pd.Series("", index=table.index)
+    annotation_cols = [col for col in ANNOTATION_COLUMNS
+                       if col in match_columns and annotations is not None and col in annotations.columns]
+    if annotation_cols:
+        joined = annotations.drop_duplicates(PROTEIN_ID).set_index(PROTEIN_ID)[annotation_cols]
+        joined = joined.fillna("").astype(str).agg(" | ".join, axis=1)
+        texts = texts + " | " + table["UniProt ID"].map(joined).fillna("")
+    table["Protein Class"] = classify(texts)
+
+    if overrides is not None and len(overrides):
+        curated = overrides.drop_duplicates("UniProt ID", keep="last").set_index("UniProt ID")["Protein Class"]
+        override_mask = table["UniProt ID"].isin(curated.index)
+        table.loc[override_mask, "Protein Class"] = table.loc[override_mask, "UniProt ID"].map(curated)
+    return table
+
+
+# The annotation columns among match_columns, or None when the rules only look at the names
+def read_annotations(out_dir=cleaned_dir, match_columns=MATCH_COLUMNS):
+    wanted = [col for col in ANNOTATION_COLUMNS if col in match_columns]
+    if not wanted:
+        return None
+    data_path = find_protein_table(out_dir)
+    if data_path.endswith(STORE_EXT):
+        names = store_column_names(data_path)
+        return read_store_columns(data_path, [PROTEIN_ID] + [col for col in wanted if col in names])
+    header = pd.read_csv(data_path, nrows=0).columns
+    return pd.read_csv(data_path, usecols=[PROTEIN_ID] + [col for col in wanted if col in header])
+
+
+# Rules-only table, built from the same inputs the classify stage reads
+def rule_table(out_dir=cleaned_dir, overrides=None, match_columns=MATCH_COLUMNS):
+    ids = pd.read_csv(os.path.join(out_dir, "unique_uniprot_ids.csv"), dtype=str)["UniProt ID"]
+    uniprot_map = read_table(find_table("uniprot_id_to_name_mapping", out_dir))
+    return build_class_table(ids, uniprot_map, read_annotations(out_dir, match_columns), overrides, match_columns)
+
+
+# === REGENERATE protein_class_mapping.csv ===
+def classify_proteins(out_dir=cleaned_dir, overrides_file=overrides_path, match_columns=MATCH_COLUMNS):
+    overrides = pd.read_csv(overrides_file, dtype=str) if os.path.exists(overrides_file) else None
+    table = rule_table(out_dir, overrides, match_columns)
+
+    class_map_path = os.path.join(out_dir, "protein_class_mapping.csv")
+    table.to_csv(class_map_path, index=False)
+    counts = ", ".join(f"{cls}: {n}" for cls, n in table["Protein Class"].value_counts().items())
+    print(f"✅ Classified {len(table)} proteins ({counts}):", class_map_path)
+    return class_map_path
+
+
+# === DERIVE OVERRIDES ===
+# Rewrites the override table as the accessions where the rules disagree with a curated mapping
+# (UniProt ID, Protein Class), then reruns the classifier with it to check every curated class is kept
+def derive_overrides(curated_file, out_dir=cleaned_dir, overrides_file=overrides_path, match_columns=MATCH_COLUMNS):
+    curated = pd.read_csv(curated_file, dtype=str).drop_duplicates("UniProt ID").set_index("UniProt ID")["Protein Class"]
+    rules = rule_table(out_dir, match_columns=match_columns).set_index("UniProt ID")["Protein Class"]
+    shared = rules.index.intersection(curated.index)
+    differs = shared[rules[shared].to_numpy() != curated[shared].to_numpy()]
+    overrides = pd.DataFrame({"UniProt ID": differs, "Protein Class": curated[differs].to_numpy()})
+
+    regenerated = rule_table(out_dir, overrides, match_columns).set_index("UniProt ID")["Protein Class"]
+    if not regenerated[shared].equals(curated[shared]):
+        raise ValueError("The derived overrides do not reproduce the curated classes")
+    overrides.to_csv(overrides_file, index=False)
+    print(f"✅ {len(overrides)} overrides keep the classes of {len(shared)} curated proteins:", overrides_file)
+    return overrides_file
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate protein_class_mapping.csv from UniProt annotations.")
+    parser.add_argument("--overrides", default=overrides_path, help="CSV of curated UniProt ID -> Protein Class exceptions")
+    parser.add_argument("--derive-from", help="Curated class mapping to rederive the overrides from (e.g. after changing MATCH_COLUMNS)")
+    args = parser.parse_args()
+    if args.derive_from:
+        derive_overrides(args.derive_from, overrides_file=args.overrides)
+    classify_proteins(overrides_file=args.overrides)
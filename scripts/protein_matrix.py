@@ -0,0 +1,76 @@
+# === Wide Protein x Sample Matrix ===
+# Protein-ID -> row index and per-sample group/treatment codes over the
+# partitioned sample store, so a protein lookup is one element per selected
+# column instead of a filter + melt + map over the whole frame.
+import numpy as np
+import pandas as pd
+from data_store import PROTEIN_ID
+
+
+def factorize(series):
+    codes, names = pd.factorize(series.astype(str), sort=True)
+    return codes, np.asarray(names, dtype=object)
+
+
+class ProteinMatrix:
+    def __init__(self, master, mapping_df, store):
+        sample_map = mapping_df[mapping_df["TMT_Label"].isin(store.labels)]
+        self.sample_labels = sample_map["TMT_Label"].to_numpy()
+        self.store = store
+
+        # Sample -> group/treatment as integer codes into small name arrays
+        self.group_codes, self.group_names = factorize(sample_map["Group"])
+        self.treatment_codes, self.treatment_names = factorize(sample_map["Cultivar_Treatment"])
+        self.sample_offsets = {label: i for i, label in enumerate(self.sample_labels)}
+
+        # Protein -> row offset; the first row wins for duplicated IDs
+        self.protein_ids = master[PROTEIN_ID].to_numpy()
+        self.row_offsets = {}
+        for i, protein_id in enumerate(self.protein_ids):
+            self.row_offsets.setdefault(protein_id, i)
+
+        names = master["UniProt Protein Name"].astype(object).where(master["UniProt Protein Name"].notna(), "Unknown")
+        labels = names.astype(str) + " (" + master[PROTEIN_ID].astype(str) + ")"
+        self.label_to_id = dict(zip(labels, self.protein_ids))
+        self.id_to_label = dict(zip(self.protein_ids, labels))
+        self.sorted_labels = sorted(self.label_to_id)
+
+    # Column offsets for the current sidebar selection, in selection order
+    def sample_columns(self, selected_labels):
+        return np.array([self.sample_offsets[label] for label in selected_labels], dtype=np.intp)
+
+    def row(self, protein_id, columns):
+        offset = self.row_offsets[protein_id]
+        return np.array([self.store.column(label)[offset] for label in self.sample_labels[columns]], dtype=np.float32)
+
+    # Copy of the selected columns (proteins x columns); imputed=True has no missing values where the store is imputed
+    def block(self, columns, imputed=False):
+        return self.store.block(self.sample_labels[columns], imputed)
+
+    # Long frame with one row per selected sample, ready for px.box
+    def protein_frame(self, protein_id, columns):
+        return pd.DataFrame({
+            "Sample": self.sample_labels[columns],
+            "Intensity": self.row(protein_id, columns),
+            "Group": self.group_names[self.group_codes[columns]],
+            "Treatment": self.treatment_names[self.treatment_codes[columns]],
+        })
+
+    # Same output as groupby("Group")["Intensity"].describe(), computed per group code
+    def describe_by_group(self, protein_id, columns):
+        intensities = self.row(protein_id, columns).astype(np.float64)
+        codes = self.group_codes[columns]
+        stats = {}
+        for code in np.unique(codes):
+            values = intensities[codes == code]
+            values = values[~np.isnan(values)]
+            if len(values):
+                q25, q50, q75 = np.percentile(values, [25, 50, 75])
+                std = values.std(ddof=1) if len(values) > 1 else np.nan
+                stats[self.group_names[code]] = [len(values), values.mean(), std, values.min(), q25, q50, q75, values.max()]
+            else:
+                stats[self.group_names[code]] = [0.0] + [np.nan] * 7
+        summary = pd.DataFrame.from_dict(
+            stats, orient="index", columns=["count", "mean", "std", "min", "25%", "50%", "75%", "max"])
+        summary.index.name = "Group"
+        return summary
@@ -0,0 +1,176 @@
+# === Partitioned Sample Store ===
+# Sample intensities split into one Arrow file per (study, group), rows aligned
+# with cleaned_data. Partitions are memory-mapped on first use and columns come
+# back as zero-copy float32 views, so a process only pages in the samples its
+# sessions actually select; past a byte budget the least recently used
+# partitions are dropped again.
+#
+#   <data>/samples/<study>/<group>.arrow   one float32 column per TMT_Label (normalized, NaN where
+#                                          not measured) plus "<TMT_Label>#imputed" with missing values filled
+#   <data>/sample_partitions.csv           TMT_Label -> partition file, observed fraction and validity
+import os
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from data_store import cleaned_dir, find_table, read_table, read_store_columns, STORE_EXT
+from normalization import preprocess
+
+DEFAULT_STUDY = "main"  # Study name for a single-dataset cleaned/ without a Study column
+INDEX_FILE = "sample_partitions.csv"
+INDEX_COLUMNS = ["Study", "Group", "Original_Column", "TMT_Label", "Partition", "Observed", "Valid"]
+IMPUTED_SUFFIX = "#imputed"
+MAX_OPEN_BYTES = 1 << 30
+
+
+def safe_name(text):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(text)).strip("_")
+
+
+def sample_rows(mapping_df):
+    return mapping_df[mapping_df["Group"].notna() & mapping_df["Cultivar_Treatment"].notna()]
+
+
+# === WRITE ===
+# One partition per group of one study's samples; frame columns are the Original_Column names.
+# The study is normalized and imputed as a whole first (see normalization.py).
+# NaN is stored as a value rather than a null so columns can be read back without a copy.
+def write_study_partitions(frame, sample_map, directory, study=DEFAULT_STUDY):
+    frame = frame[sample_map["Original_Column"].tolist()]
+    normalized, imputed, quality = preprocess(frame, sample_map)
+    index = []
+    for group, rows in sample_map.groupby("Group", sort=True, observed=True):
+        partition = os.path.join("samples", safe_name(study), f"{safe_name(group)}{STORE_EXT}")
+        path = os.path.join(directory, partition)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cols, labels = rows["Original_Column"].tolist(), rows["TMT_Label"].tolist()
+        arrays = [pa.array(normalized[col].to_numpy(dtype=np.float32)) for col in cols]
+        if imputed is not None:
+            arrays += [pa.array(imputed[col].to_numpy(dtype=np.float32)) for col in cols]
+            labels += [label + IMPUTED_SUFFIX for label in labels]
+        table = pa.table(arrays, names=labels)
+        with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=len(frame) or None)  # One batch, so columns stay contiguous
+        os.replace(path + ".tmp", path)
+        index.append(rows.assign(Study=study, Partition=partition, Observed=quality.loc[cols, "Observed"].to_numpy(),
+                                 Valid=quality.loc[cols, "Valid"].to_numpy()))
+    return pd.concat(index, ignore_index=True) if index else pd.DataFrame(columns=INDEX_COLUMNS)
+
+
+# The index is written last, so readers only ever see complete partitions; files it no longer lists are removed
+def write_partition_index(index, directory):
+    index_path = os.path.join(directory, INDEX_FILE)
+    index[INDEX_COLUMNS].to_csv(index_path + ".tmp", index=False)
+    os.replace(index_path + ".tmp", index_path)
+
+    listed = {os.path.normpath(os.path.join(directory, partition)) for partition in index["Partition"]}
+    for root, _, files in os.walk(os.path.join(directory, "samples")):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if name.endswith(STORE_EXT) and path not in listed:
+                os.remove(path)
+    return index_path
+
+
+# Partition a single-dataset cleaned/ directory (cleaned_data + mapping_table)
+def partition_cleaned(directory=cleaned_dir):
+    sample_map = sample_rows(read_table(find_table("mapping_table", directory)))
+    data_path = find_table("cleaned_data", directory)
+    cols = sample_map["Original_Column"].tolist()
+    if data_path.endswith(STORE_EXT):
+        frame = read_store_columns(data_path, cols)
+    else:
+        frame = pd.read_csv(data_path, usecols=cols, dtype={col: "float32" for col in cols})
+    index_path = write_partition_index(write_study_partitions(frame, sample_map, directory), directory)
+    print(f"✅ Partitioned {len(cols)} samples by group:", index_path)
+    return index_path
+
+
+# Rebuilds the partitions when they are missing or older than the tables they come from
+def ensure_partitions(directory=cleaned_dir):
+    index_path = os.path.join(directory, INDEX_FILE)
+    try:
+        sources = [find_table(name, directory) for name in ("cleaned_data", "mapping_table")]
+    except FileNotFoundError:
+        if os.path.exists(index_path):  # An ingested atlas: ingest.py writes its partitions itself
+            return index_path
+        raise
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < max(map(os.path.getmtime, sources)):
+        partition_cleaned(directory)
+    return index_path
+
+
+# === READ ===
+class SampleStore:
+    def __init__(self, directory=cleaned_dir, max_bytes=MAX_OPEN_BYTES):
+        self.directory = directory
+        self.index = pd.read_csv(os.path.join(directory, INDEX_FILE), dtype=str)
+        self.partition_of = dict(zip(self.index["TMT_Label"], self.index["Partition"]))
+        self.labels = self.index["TMT_Label"].tolist()
+        valid = self.index["Valid"] == "True" if "Valid" in self.index else pd.Series(True, index=self.index.index)
+        self.valid = dict(zip(self.labels, valid))  # False for samples with too few observed values
+        self.max_bytes = max_bytes
+        self.open = OrderedDict()   # Partition -> (label -> column view, mapped bytes), oldest first
+        self.open_bytes = 0
+        self.hits = self.misses = 0  # Partition lookups served from / opened into the open set
+        self.lock = threading.Lock()
+
+    def _columns(self, partition):
+        with self.lock:
+            if partition in self.open:
+                self.hits += 1
+                self.open.move_to_end(partition)
+                return self.open[partition][0]
+
+            self.misses += 1
+            source = pa.memory_map(os.path.join(self.directory, partition))
+            table = pa.ipc.open_file(source).read_all()
+            columns = {name: column.chunks[0].to_numpy() if column.num_chunks == 1 else column.to_numpy()
+                       for name, column in zip(table.column_names, table.columns)}
+            self.open[partition] = (columns, source.size())
+            self.open_bytes += source.size()
+
+            # Views already handed out keep their mapping alive until they are released
+            while self.open_bytes > self.max_bytes and len(self.open) > 1:
+                _, (_, size) = self.open.popitem(last=False)
+                self.open_bytes -= size
+            return columns
+
+    # Normalized values, NaN where not measured; imputed=True fills those (when the store has imputed columns)
+    def column(self, label, imputed=False):
+        columns = self._columns(self.partition_of[label])
+        return columns.get(label + IMPUTED_SUFFIX, columns[label]) if imputed else columns[label]
+
+    @property
+    def n_rows(self):
+        return len(self.column(self.labels[0])) if self.labels else 0
+
+    # Copy of the given columns side by side (proteins x labels)
+    def block(self, labels, imputed=False):
+        if not len(labels):
+            return np.empty((self.n_rows, 0), dtype=np.float32)
+        return np.column_stack([self.column(label, imputed) for label in labels])
+
+
+# === IN-MEMORY STORE ===
+# Same interface as SampleStore over a parsed proteins x samples array (e.g. an upload),
+# so ProteinMatrix and select_samples work on it unchanged
+class ArrayStore:
+    def __init__(self, values, labels):
+        self.values = np.asfortranarray(values, dtype=np.float32)  # Column-major: each sample column is contiguous
+        self.labels = list(labels)
+        self.offsets = {label: i for i, label in enumerate(self.labels)}
+        self.partition_of = dict.fromkeys(self.labels, "memory")
+        self.valid = dict.fromkeys(self.labels, True)
+
+    def column(self, label, imputed=False):
+        return self.values[:, self.offsets[label]]
+
+    @property
+    def n_rows(self):
+        return len(self.values)
+
+    def block(self, labels, imputed=False):
+        return self.values[:, [self.offsets[label] for label in labels]]
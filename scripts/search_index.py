@@ -0,0 +1,94 @@
+# === Protein Search Index ===
+# Ranked, typo-tolerant lookup over accession, UniProt name, gene names and
+# MaxQuant protein names, so the protein pickers only receive the top matches
+# instead of every label in the dataset.
+#
+# Scoring per query token: exact accession > exact word > word prefix > shared
+# character trigrams (catches typos and partial words). Scores add up over tokens.
+import bisect
+import re
+from collections import defaultdict
+import numpy as np
+from data_store import PROTEIN_ID
+
+SEARCH_FIELDS = [PROTEIN_ID, "UniProt Protein Name", "Gene names", "Protein names"]
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MIN_TRIGRAM_SIMILARITY = 0.5
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProteinSearchIndex:
+    def __init__(self, master, labels):
+        first_rows = master.drop_duplicates(PROTEIN_ID)
+        self.protein_ids = first_rows[PROTEIN_ID].to_numpy()
+        self.labels = np.asarray([labels[protein_id] for protein_id in self.protein_ids], dtype=object)
+        self.accessions = {str(protein_id).lower(): doc for doc, protein_id in enumerate(self.protein_ids)}
+
+        # Inverted indexes: word -> docs and trigram -> words
+        word_docs = defaultdict(set)
+        fields = [first_rows[col].fillna("").to_numpy() for col in SEARCH_FIELDS if col in first_rows.columns]
+        for doc, values in enumerate(zip(*fields)):
+            for value in values:
+                for token in tokenize(value):
+                    word_docs[token].add(doc)
+        self.words = sorted(word_docs)
+        self.word_docs = [np.fromiter(word_docs[word], dtype=np.int32) for word in self.words]
+        word_ids = {word: i for i, word in enumerate(self.words)}
+
+        gram_words = defaultdict(list)
+        for word, i in word_ids.items():
+            for gram in trigrams(word):
+                gram_words[gram].append(i)
+        self.gram_words = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in gram_words.items()}
+        self.word_gram_counts = np.asarray([len(trigrams(word)) for word in self.words], dtype=np.float32)
+
+    # Best score each document gets for one query token
+    def _token_scores(self, token):
+        scores = np.zeros(len(self.protein_ids), dtype=np.float32)
+
+        # Words starting with the token; an exact word match ranks above a prefix
+        start = bisect.bisect_left(self.words, token)
+        end = bisect.bisect_left(self.words, token + "\uffff")
+        if end > start:
+            scores[np.concatenate(self.word_docs[start:end])] = 2.0
+            if self.words[start] == token:
+                scores[self.word_docs[start]] = 3.0
+
+        # Typo tolerance: Dice similarity of trigram sets between the token and each word
+        grams = trigrams(token)
+        hits = [self.gram_words[gram] for gram in grams if gram in self.gram_words]
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.words)).astype(np.float32)
+            similarity = 2 * shared / (len(grams) + self.word_gram_counts)
+            similar = np.flatnonzero(similarity >= MIN_TRIGRAM_SIMILARITY)
+            if len(similar):
+                docs = [self.word_docs[i] for i in similar]
+                values = np.repeat(similarity[similar], [len(d) for d in docs])
+                np.maximum.at(scores, np.concatenate(docs), values)
+
+        if token in self.accessions:
+            scores[self.accessions[token]] = 10.0
+        return scores
+
+    # Top-k labels for a free-text query, best first; ties keep alphabetical label order
+    def search(self, query, k=50):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = sum(self._token_scores(token) for token in tokens)
+        whole = query.strip().lower()
+        if whole in self.accessions:  # Accessions with separators, e.g. isoforms like P12345-2
+            scores[self.accessions[whole]] += 10.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = sorted(candidates, key=lambda doc: (-scores[doc], self.labels[doc]))
+        return [self.labels[doc] for doc in ranked]
@@ -0,0 +1,64 @@
+# === Shared Data Plane ===
+# Lets several dashboard / API processes on one host share the loaded data.
+# Sample intensities are already memory-mapped Arrow partitions (shared through
+# the page cache). With FUSARIUM_SHARED_DATA=1 the joined annotation frame is
+# also published once per dataset version as an uncompressed Arrow file, and
+# every process attaches it memory-mapped with Arrow-backed pandas columns, so
+# its strings are read-only views instead of private Python objects.
+#
+#   <data>/.shared/<version>/annotations.arrow   version: see snapshots.current_version
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from snapshots import KEEP_SNAPSHOTS, LIVE_PREFIX, snapshots_root
+
+ENABLED = os.environ.get("FUSARIUM_SHARED_DATA") == "1"
+SHARED_DIR = ".shared"
+
+
+def shared_path(directory, version, name):
+    return os.path.join(directory, SHARED_DIR, version, f"{name}.arrow")
+
+
+# Dictionary (categorical) columns are stored as plain values so every column attaches as one ArrowDtype
+def publish_frame(frame, path):
+    table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(None)
+    table = table.cast(pa.schema([
+        pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+        for field in table.schema
+    ]))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # Replicas may publish the same version at once
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    return path
+
+
+def attach_frame(path):
+    return feather.read_table(path, memory_map=True).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+# Keeps the current version and those of the retained snapshots (the newest KEEP_SNAPSHOTS for unpublished
+# "live-" data), so replicas still starting up or reloading on a previous version can attach it.
+# Processes still attached to a removed version keep their mapping until they reload.
+def prune_versions(directory, current):
+    root = os.path.join(directory, SHARED_DIR)
+    published = snapshots_root(directory)
+    retained = {current} | (set(os.listdir(published)) if os.path.isdir(published) else set())
+    live = sorted((version for version in os.listdir(root) if version.startswith(LIVE_PREFIX)),
+                  key=lambda version: os.path.getmtime(os.path.join(root, version)), reverse=True)
+    retained |= set(live[:KEEP_SNAPSHOTS])
+    for version in os.listdir(root):
+        if version not in retained:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+
+# The named frame for this dataset version, built with build() and published by the first process that needs it
+def shared_frame(directory, version, name, build):
+    path = shared_path(directory, version, name)
+    if not os.path.exists(path):
+        publish_frame(build(), path)
+        prune_versions(directory, version)
+    return attach_frame(path)
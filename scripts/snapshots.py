@@ -0,0 +1,161 @@
+# === Versioned Dataset Snapshots ===
+# The dashboard and the API read a frozen snapshot of the data directory, not
+# the files the pipeline rewrites. publish_snapshot() hard-links the dataset
+# files into <data>/.snapshots/<version>/ next to a manifest of their content
+# hashes; the version is a hash of that manifest, so it only changes when the
+# data does. Moving CURRENT to a new version is one os.replace, so a reader
+# sees the old snapshot or the new one, never a mix, and a process still
+# using the previous snapshot keeps reading it until it reloads.
+#
+#   <data>/.snapshots/<version>/manifest.json   {"version", "created", "files": {path: {"sha256", "bytes"}}}
+#   <data>/.snapshots/CURRENT                   version readers load
+#
+# Without a published snapshot, readers use <data> itself under a "live-"
+# version taken from the mtimes and sizes of the dataset files it holds, so a
+# single cleaned dataset and an ingested atlas (proteins.arrow) both work.
+#
+# Run: python scripts/snapshots.py [--data cleaned/atlas]
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from data_store import cleaned_dir, STORE_EXT, TABLE_EXTS
+from sample_store import ensure_partitions
+
+SNAPSHOTS_DIR = ".snapshots"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LIVE_PREFIX = "live-"
+KEEP_SNAPSHOTS = 3      # Older ones are removed; the dashboard keeps engines for the current and previous one
+DATASET_DIRS = ["samples"]
+
+
+def snapshots_root(directory):
+    return os.path.join(directory, SNAPSHOTS_DIR)
+
+
+# === FILES ===
+# Relative paths of the files a snapshot holds: the top-level tables and the sample partitions.
+# A text table with an Arrow store next to it is left out, since find_table always picks the store.
+def dataset_files(directory):
+    names = sorted(name for name in os.listdir(directory)
+                   if not name.startswith(".") and not name.endswith(".tmp")
+                   and os.path.isfile(os.path.join(directory, name)))
+    stored = {name[:-len(STORE_EXT)] for name in names if name.endswith(STORE_EXT)}
+    files = [name for name in names
+             if not any(name.endswith(ext) and name[:-len(ext)] in stored for ext in TABLE_EXTS[1:])]
+    for sub in DATASET_DIRS:
+        for root, _, filenames in os.walk(os.path.join(directory, sub)):
+            files += sorted(os.path.relpath(os.path.join(root, name), directory)
+                            for name in filenames if name.endswith(STORE_EXT))
+    return files
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_version(files):
+    return hashlib.sha256(json.dumps(sorted(files.items())).encode("utf-8")).hexdigest()[:16]
+
+
+# Arrow stores are always written to a temporary file and renamed, so a hard link keeps the old
+# content when the pipeline rewrites them; text tables may be rewritten in place and are copied
+def freeze(source, target):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if source.endswith(STORE_EXT):
+        try:
+            os.link(source, target)
+            return
+        except OSError:  # Other filesystem, or no hard links
+            pass
+    shutil.copy2(source, target)
+
+
+# === PUBLISH ===
+# Freezes the current files as a snapshot and makes it current; returns its version.
+# digest(path) -> sha256 lets the pipeline reuse the hashes it already keeps.
+def publish_snapshot(directory=cleaned_dir, digest=file_sha256, keep=KEEP_SNAPSHOTS):
+    files = {}
+    for rel in dataset_files(directory):
+        path = os.path.join(directory, rel)
+        files[rel.replace(os.sep, "/")] = {"sha256": digest(path), "bytes": os.path.getsize(path)}
+    version = manifest_version(files)
+    root = snapshots_root(directory)
+    target = os.path.join(root, version)
+
+    if not os.path.exists(os.path.join(target, MANIFEST_FILE)):
+        staging = f"{target}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for rel in files:
+            freeze(os.path.join(directory, rel), os.path.join(staging, rel))
+        manifest = {"version": version, "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "files": files}
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=1)
+        shutil.rmtree(target, ignore_errors=True)  # Left over from an interrupted publish
+        os.rename(staging, target)
+
+    if current_version(directory) != version:
+        current_path = os.path.join(root, CURRENT_FILE)
+        with open(current_path + ".tmp", "w", encoding="utf-8") as handle:
+            handle.write(version)
+        os.replace(current_path + ".tmp", current_path)  # The swap readers see
+        print(f"✅ Published dataset snapshot {version}:", target)
+    prune_snapshots(directory, keep)
+    return version
+
+
+# Keeps the newest snapshots (always including the current one); processes still reading a removed
+# snapshot keep their open files, but should have reloaded by then. Staging directories are left alone.
+def prune_snapshots(directory, keep=KEEP_SNAPSHOTS):
+    root = snapshots_root(directory)
+    current = current_version(directory)
+    versions = sorted((name for name in os.listdir(root)
+                       if os.path.isdir(os.path.join(root, name)) and not name.endswith(".tmp")),
+                      key=lambda name: os.path.getmtime(os.path.join(root, name)), reverse=True)
+    kept = [current] + [version for version in versions if version != current]
+    for version in versions:
+        if version not in kept[:keep]:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+
+
+# === READ ===
+# Version readers should load: the published CURRENT, else a "live-" stamp of the files in place
+def current_version(directory=cleaned_dir):
+    try:
+        with open(os.path.join(snapshots_root(directory), CURRENT_FILE), encoding="utf-8") as handle:
+            version = handle.read().strip()
+        if version:
+            return version
+    except FileNotFoundError:
+        pass
+    stamps = []
+    for rel in dataset_files(directory):
+        stat = os.stat(os.path.join(directory, rel))
+        stamps.append((rel, stat.st_mtime_ns, stat.st_size))
+    stamp = json.dumps(stamps).encode("utf-8")
+    return LIVE_PREFIX + hashlib.sha256(stamp).hexdigest()[:16]
+
+
+# Directory holding the files of a version
+def snapshot_dir(directory, version):
+    if version.startswith(LIVE_PREFIX):
+        return directory
+    return os.path.join(snapshots_root(directory), version)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the data directory as a versioned snapshot and make it current.")
+    parser.add_argument("--data", default=cleaned_dir, help="Directory of the cleaned tables")
+    parser.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS, help="Snapshots kept on disk")
+    args = parser.parse_args()
+    ensure_partitions(args.data)  # A snapshot is never written to, so the partitions must exist first
+    print(publish_snapshot(args.data, keep=args.keep))
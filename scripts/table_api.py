@@ -0,0 +1,42 @@
+# === Server-side Rows for the Full Data Table ===
+# Filtering, sorting and paging run here over the cached master frame, and
+# only the visible window is handed to AgGrid instead of the whole table.
+import numpy as np
+
+# Columns offered as text filters in the table (column -> display name)
+TEXT_FILTER_COLUMNS = {"UniProt Protein Name": "Protein Name", "Gene names": "Gene Names"}
+
+
+# === FILTER ===
+# text_filters: ((column, substring), ...); number_filters: ((column, min or None, max or None), ...)
+def filter_rows(frame, text_filters=(), number_filters=()):
+    mask = np.ones(len(frame), dtype=bool)
+    for col, needle in text_filters:
+        if needle:
+            mask &= frame[col].str.contains(needle, case=False, regex=False, na=False).to_numpy(dtype=bool)
+    for col, low, high in number_filters:
+        values = frame[col].to_numpy()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    return np.flatnonzero(mask)
+
+
+# === SORT ===
+def sort_rows(frame, rows, sort_by=None, ascending=True):
+    if sort_by is None:
+        return rows
+    keys = frame[sort_by].iloc[rows].reset_index(drop=True)
+    order = keys.sort_values(ascending=ascending, na_position="last", kind="stable").index.to_numpy()
+    return rows[order]
+
+
+# === PAGE ===
+def page_count(n_rows, page_size):
+    return max(1, -(-n_rows // page_size))
+
+
+def page_window(frame, rows, columns, page, page_size):
+    start = page * page_size
+    return frame.iloc[rows[start:start + page_size]][columns].reset_index(drop=True)
@@ -1,16 +1,64 @@
+import argparse
+import os
 import pandas as pd
+from data_store import cleaned_dir, find_protein_table, read_store_columns, STORE_EXT, PROTEIN_ID
+from annotation_cache import AnnotationCache, UniProtRestFetcher, FlatFileFetcher
 
-# Load your cleaned data
-df = pd.read_csv(r"C:\Users\Dell User\Desktop\Fusarium_Proteomics_Project\Fusarium_Project\cleaned\cleaned_data.csv")
+cache_path = os.path.join(cleaned_dir, ".build", "uniprot_cache.sqlite")
 
-# Extract unique UniProt IDs
-protein_ids = df["T: Single Protein IDs"].dropna().unique()
 
-# Save to your 'cleaned' folder inside your project
-pd.DataFrame(protein_ids, columns=["UniProt ID"]).to_csv(
-    r"C:\Users\Dell User\Desktop\Fusarium_Proteomics_Project\Fusarium_Project\cleaned\unique_uniprot_ids.csv",
-    index=False
-)
+# Extract unique UniProt IDs from the cleaned data, reading only the ID column
+def extract_unique_ids(out_dir=cleaned_dir):
+    data_path = find_protein_table(out_dir)
+    if data_path.endswith(STORE_EXT):
+        ids = read_store_columns(data_path, [PROTEIN_ID])[PROTEIN_ID]
+    else:
+        ids = pd.read_csv(data_path, usecols=[PROTEIN_ID])[PROTEIN_ID]
+    protein_ids = ids.dropna().unique()
 
-print("✅ Saved unique UniProt IDs to your cleaned folder.")
+    # Save to the 'cleaned' folder inside the project
+    ids_path = os.path.join(out_dir, "unique_uniprot_ids.csv")
+    pd.DataFrame(protein_ids, columns=["UniProt ID"]).to_csv(ids_path, index=False)
+    print("✅ Saved unique UniProt IDs to:", ids_path)
+    return ids_path
 
+
+# Resolve the unique IDs through the local cache and write uniprot_id_to_name_mapping.tsv.gz.
+# Only accessions the cache has never seen go to the fetcher; fetcher=None resolves from the cache alone.
+def annotate_ids(out_dir=cleaned_dir, fetcher=None, cache_file=cache_path):
+    ids = pd.read_csv(os.path.join(out_dir, "unique_uniprot_ids.csv"), dtype=str)["UniProt ID"].dropna()
+    mapping_path = os.path.join(out_dir, "uniprot_id_to_name_mapping.tsv.gz")
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    cache = AnnotationCache(cache_file)
+    try:
+        # Entries already in the current mapping file never need to be fetched again
+        if os.path.exists(mapping_path):
+            previous = pd.read_csv(mapping_path, sep="\t", dtype=str)
+            cache.store(previous[previous["From"].isin(cache.missing(previous["From"]))])
+
+        entries = cache.resolve(ids, fetcher)
+    finally:
+        cache.close()
+
+    # mtime=0 keeps the gzip bytes identical for identical content
+    entries.to_csv(mapping_path, sep="\t", index=False, compression={"method": "gzip", "mtime": 0})
+    print(f"✅ Annotated {len(entries)} of {len(ids)} UniProt IDs:", mapping_path)
+    return mapping_path
+
+
+def make_fetcher(source, flat_file=None):
+    if source == "uniprot":
+        return UniProtRestFetcher()
+    if source == "flatfile":
+        return FlatFileFetcher(flat_file)
+    return None  # "cache": offline, cache only
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract unique UniProt IDs and resolve their names.")
+    parser.add_argument("--source", choices=["cache", "uniprot", "flatfile"], default="cache",
+                        help="Where to look up accessions missing from the local cache")
+    parser.add_argument("--flat-file", help="UniProt TSV dump used with --source flatfile")
+    args = parser.parse_args()
+    extract_unique_ids()
+    annotate_ids(fetcher=make_fetcher(args.source, args.flat_file))
@@ -0,0 +1,93 @@
+# === Upload Ingestion ===
+# Parses a user CSV for the "Upload Your Own Data" tab. The header and the
+# first rows are sniffed and validated before the body is read; the body is
+# then streamed in chunks with intensities parsed straight into float32, and
+# the result is the same indexed ProteinMatrix the built-in data uses.
+import hashlib
+import numpy as np
+import pandas as pd
+from data_store import PROTEIN_ID
+from protein_matrix import ProteinMatrix
+from sample_store import ArrayStore
+
+REQUIRED_COLUMNS = [PROTEIN_ID, "Gene names", "Protein names"]
+MAX_UPLOAD_MB = 1024     # Keep in line with server.maxUploadSize in .streamlit/config.toml
+SNIFF_ROWS = 200         # Rows read up front to tell intensity columns from text columns
+CHUNK_ROWS = 50_000
+
+
+class UploadError(ValueError):
+    pass
+
+
+def file_digest(handle, block_bytes=1 << 22):
+    digest = hashlib.sha256()
+    handle.seek(0)
+    while block := handle.read(block_bytes):
+        digest.update(block)
+    handle.seek(0)
+    return digest.hexdigest()
+
+
+# === SNIFF ===
+# Intensity columns: every non-required column whose sniffed values are all numeric (or empty).
+# Returns (intensity columns, ignored text columns); raises UploadError before any body parse.
+def sniff_columns(handle, size=None):
+    if size is not None and size > MAX_UPLOAD_MB * 1024 ** 2:
+        raise UploadError(f"The file is {size / 1024 ** 2:,.0f} MB; the limit is {MAX_UPLOAD_MB:,} MB.")
+    handle.seek(0)
+    try:
+        head = pd.read_csv(handle, nrows=SNIFF_ROWS, dtype=str)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as exc:
+        raise UploadError(f"Could not read the file as CSV: {exc}")
+    finally:
+        handle.seek(0)
+
+    missing = [col for col in REQUIRED_COLUMNS if col not in head.columns]
+    if missing:
+        raise UploadError(f"Missing required columns: {', '.join(missing)}")
+    duplicated = head.columns[head.columns.str.contains(r"\.\d+$") &
+                              head.columns.str.replace(r"\.\d+$", "", regex=True).isin(head.columns)]
+    if len(duplicated):
+        raise UploadError(f"Duplicated column names: {', '.join(duplicated)}")
+
+    intensity, ignored = [], []
+    for col in head.columns.drop(REQUIRED_COLUMNS):
+        values = head[col].dropna()
+        (intensity if pd.to_numeric(values, errors="coerce").notna().all() else ignored).append(col)
+    if not intensity:
+        raise UploadError("No intensity columns detected. Make sure you included sample columns (e.g., Sample1, Sample2...).")
+    return intensity, ignored
+
+
+# === PARSE ===
+# (annotation frame, float32 proteins x samples array), streamed in CHUNK_ROWS pieces
+def read_body(handle, intensity_cols, chunk_rows=CHUNK_ROWS):
+    dtypes = {col: str for col in REQUIRED_COLUMNS} | {col: np.float32 for col in intensity_cols}
+    annotations, blocks = [], []
+    handle.seek(0)
+    try:
+        for chunk in pd.read_csv(handle, usecols=REQUIRED_COLUMNS + intensity_cols, dtype=dtypes, chunksize=chunk_rows):
+            annotations.append(chunk[REQUIRED_COLUMNS])
+            blocks.append(chunk[intensity_cols].to_numpy(dtype=np.float32))
+    except ValueError as exc:  # A non-numeric value past the sniffed rows
+        raise UploadError(f"Intensity columns must be numeric: {exc}")
+    finally:
+        handle.seek(0)
+    if not blocks:
+        raise UploadError("The file has a header but no protein rows.")
+    return pd.concat(annotations, ignore_index=True), np.concatenate(blocks)
+
+
+# Samples are their own group, so per-group summaries are per sample as in the upload's columns
+def upload_matrix(annotations, values, intensity_cols):
+    master = annotations.assign(**{"UniProt Protein Name": annotations["Protein names"]})
+    mapping = pd.DataFrame({"TMT_Label": intensity_cols, "Group": intensity_cols, "Cultivar_Treatment": "Upload"})
+    return master, ProteinMatrix(master, mapping, ArrayStore(values, intensity_cols))
+
+
+# (annotation frame, ProteinMatrix, ignored text columns) for an uploaded CSV
+def load_upload(handle, size=None):
+    intensity_cols, ignored = sniff_columns(handle, size)
+    annotations, values = read_body(handle, intensity_cols)
+    return *upload_matrix(annotations, values, intensity_cols), ignored
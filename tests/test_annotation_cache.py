@@ -0,0 +1,36 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from annotation_cache import ENTRY_COLUMNS, AnnotationCache, StubFetcher
+
+
+class CountingFetcher(StubFetcher):
+    def __init__(self, source, entries=None):
+        super().__init__(entries)
+        self.source = source
+        self.requested = []
+
+    def __call__(self, accessions):
+        self.requested += accessions
+        return super().__call__(accessions)
+
+
+# Not found offline, then switched to a source that knows the accession
+def test_switching_source_refetches_not_found(tmp_path):
+    entry = pd.DataFrame([["P12345", "P12345", "reviewed", "TEST_WHEAT", "Test protein", "", "Triticum aestivum", "100"]],
+                         columns=ENTRY_COLUMNS)
+    cache = AnnotationCache(str(tmp_path / "cache.sqlite"))
+
+    flat_file = CountingFetcher("flatfile:dump.tsv")
+    assert cache.resolve(["P12345"], flat_file).empty
+    assert cache.resolve(["P12345"], flat_file).empty
+    assert flat_file.requested == ["P12345"]  # A not-found answer is cached for the same source
+
+    uniprot = CountingFetcher("uniprot", entry)
+    assert cache.resolve(["P12345"], uniprot)["Protein names"].tolist() == ["Test protein"]
+    assert uniprot.requested == ["P12345"]
+
+    assert cache.resolve(["P12345"])["Protein names"].tolist() == ["Test protein"]
+    cache.close()
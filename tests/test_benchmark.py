@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from benchmark import SETUP_STAGES, run_benchmarks
+
+
+# cluster and render read the heatmaps, which the heatmap stage builds untimed when not selected
+def test_selected_stages_run_their_prerequisites(tmp_path):
+    report = run_benchmarks(300, 24, stages=["cluster", "render"], workdir=str(tmp_path), trace_memory=False)
+    assert list(report["stages"]) == SETUP_STAGES + ["cluster", "render"]
@@ -0,0 +1,35 @@
+import os
+import shutil
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import ingest
+from atlas_engine import AtlasEngine
+from benchmark import generate_dataset
+
+
+# Two exports, the second measuring only the first 40 of the first one's 60 proteins
+def test_ingested_atlas_loads_in_engine(tmp_path, monkeypatch):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    for study, n_proteins, seed in [("alpha", 60, 0), ("beta", 40, 1)]:
+        raw_path, _ = generate_dataset(str(tmp_path / study), n_proteins, 24, seed=seed)
+        shutil.copy(raw_path, exports / f"{study}.txt")
+    monkeypatch.setattr(ingest, "studies_build_dir", str(tmp_path / ".build"))
+
+    out_dir = str(tmp_path / "atlas")
+    ingest.ingest(str(exports), out_dir, workers=2, cache_file=str(tmp_path / "uniprot_cache.sqlite"))
+    engine = AtlasEngine(out_dir, shared=False)
+
+    assert sorted(engine.mapping["Study"].unique()) == ["alpha", "beta"]
+    assert len(engine.matrix.row_offsets) == 60
+    alpha = [label for label in engine.sample_labels() if label.startswith("alpha:")]
+    beta = [label for label in engine.sample_labels() if label.startswith("beta:")]
+    assert len(alpha) == len(beta) == 23  # The first channel carries the Perseus row tags and is skipped
+
+    values = engine.intensities(["SYN0000010", "SYN0000050"], alpha + beta).to_numpy()
+    assert np.isfinite(values[0]).mean() > 0.8
+    assert np.isnan(values[1, len(alpha):]).all()  # Not measured in beta
+    assert engine.annotations(["SYN0000050"])["Protein Class"].notna().all()
+    assert engine.search("SYN0000050", 1) == [engine.matrix.id_to_label["SYN0000050"]]
@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from normalization import preprocess
+
+
+# A fully observed study of 1,500 proteins aligned onto a 10,000-protein atlas union (as ingest.align_study does)
+def test_union_aligned_study_stays_valid():
+    rng = np.random.default_rng(0)
+    columns = [f"Reporter intensity corrected {i} 1" for i in range(1, 7)]
+    study = pd.DataFrame(rng.normal(20, 1, (1500, len(columns))), columns=columns,
+                         index=[f"P{i:05d}" for i in range(1500)], dtype=np.float32)
+    frame = study.reindex([f"P{i:05d}" for i in range(10_000)])
+    sample_map = pd.DataFrame({"Original_Column": columns, "TMT_Label": [f"TMT_{i}" for i in range(len(columns))]})
+
+    normalized, imputed, quality = preprocess(frame, sample_map)
+
+    assert (quality["Observed"] == 1.0).all()
+    assert quality["Valid"].all()
+    assert normalized.iloc[1500:].isna().all().all()  # Proteins the study never measured stay absent
+    assert imputed.iloc[1500:].isna().all().all()
+
+
+def test_sparse_channel_is_flagged():
+    rng = np.random.default_rng(1)
+    columns = ["Reporter intensity corrected 1 1", "Reporter intensity corrected 2 1"]
+    values = rng.normal(20, 1, (1000, 2)).astype(np.float32)
+    values[100:, 1] = np.nan  # Second channel sees 10% of the study's proteins
+    frame = pd.DataFrame(values, columns=columns).reindex(range(4000))
+    sample_map = pd.DataFrame({"Original_Column": columns, "TMT_Label": ["TMT_1", "TMT_2"]})
+
+    _, _, quality = preprocess(frame, sample_map)
+
+    assert quality["Observed"].tolist() == [1.0, 0.1]
+    assert quality["Valid"].tolist() == [True, False]
@@ -0,0 +1,23 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+from analysis_frame import build_analysis_frame
+from data_store import PROTEIN_ID
+from search_index import ProteinSearchIndex
+
+
+# The class table carries its own Protein names column, as protein_class_mapping.csv does
+def test_protein_names_are_searchable():
+    annotations = pd.DataFrame({PROTEIN_ID: ["P1", "P2"], "Protein names": ["Wheatwin-2", "Ribosomal protein L3"],
+                                "Gene names": ["WIN2", "RPL3"]})
+    uniprot_map = pd.DataFrame({"From": ["P1", "P2"], "Protein names": ["Pathogenesis-related protein 4", "60S L3"]})
+    class_df = pd.DataFrame({"UniProt ID": ["P1", "P2"], "Protein names": ["Pathogenesis-related protein 4", "60S L3"],
+                             "Protein Class": ["Stress-response", "Housekeeping"]})
+
+    master, annotation_cols = build_analysis_frame(annotations, uniprot_map, class_df)
+    assert annotation_cols == [PROTEIN_ID, "Protein names", "Gene names", "UniProt Protein Name", "Protein Class"]
+
+    labels = dict(zip(master[PROTEIN_ID], master[PROTEIN_ID]))
+    assert ProteinSearchIndex(master, labels).search("wheatwin", 5) == ["P1"]
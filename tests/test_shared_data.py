@@ -0,0 +1,20 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+import shared_data
+from snapshots import SNAPSHOTS_DIR
+
+
+# v1 was pruned from the snapshots; v2 is still retained, so a replica reloading on it can attach
+def test_publishing_keeps_retained_versions(tmp_path):
+    for version in ["v2", "v3"]:
+        os.makedirs(tmp_path / SNAPSHOTS_DIR / version)
+    for version in ["v1", "v2"]:
+        shared_data.publish_frame(pd.DataFrame({"a": [1]}), shared_data.shared_path(str(tmp_path), version, "annotations"))
+
+    frame = shared_data.shared_frame(str(tmp_path), "v3", "annotations", lambda: pd.DataFrame({"a": [3]}))
+    assert frame["a"].tolist() == [3]
+    assert sorted(os.listdir(tmp_path / shared_data.SHARED_DIR)) == ["v2", "v3"]
+    assert shared_data.shared_frame(str(tmp_path), "v2", "annotations", None)["a"].tolist() == [1]